@@ -0,0 +1,193 @@
+"""Micro-benchmark: per-report render time, legacy f-strings vs format_map templates.
+
+    python benchmarks/bench_reports.py [--iterations 2000]
+
+The legacy_* functions are the report builders as they were before the
+report templates, kept here as the "before" baseline. Outputs are checked for
+equality (ignoring the timestamp) before anything is timed.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import logging
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import phone_lookup_bot as bot_module  # noqa: E402
+
+NUMBERS = ['+14155552671', '+911234567890', '+442071838750', '+919876543210', '+61291234567']
+_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} UTC')
+
+
+def _legacy_number_type(number_type):
+    types = {
+        0: "फिक्स्ड लाइन (Fixed Line)",
+        1: "मोबाइल (Mobile)",
+        2: "फिक्स्ड लाइन या मोबाइल (Fixed Line or Mobile)",
+        3: "टोल फ्री (Toll Free)",
+        4: "प्रीमियम रेट (Premium Rate)",
+        5: "साझा लागत (Shared Cost)",
+        6: "VoIP",
+        7: "व्यक्तिगत नंबर (Personal Number)",
+        8: "पेजर (Pager)",
+        9: "UAN",
+        10: "वॉयसमेल (Voicemail)",
+        -1: "अज्ञात (Unknown)"
+    }
+    return types.get(number_type, "अज्ञात (Unknown)")
+
+
+def _legacy_links(phone_number):
+    number_no_plus = phone_number.replace('+', '')
+    encoded = phone_number.replace('+', '%2B').replace(' ', '+')
+    return {
+        'Google': f"https://www.google.com/search?q={encoded}",
+        'TrueCaller': f"https://www.truecaller.com/search/in/{number_no_plus}",
+        'Facebook': f"https://www.facebook.com/search/top/?q={encoded}",
+        'LinkedIn': f"https://www.linkedin.com/search/results/all/?keywords={encoded}",
+        'Twitter (X)': f"https://twitter.com/search?q={encoded}",
+        'Instagram (Tag)': f"https://www.instagram.com/explore/tags/{number_no_plus}"
+    }
+
+
+def legacy_basic_report(info, phone_number):
+    timezone_str = ', '.join(info['timezone']) if info['timezone'] else 'अज्ञात'
+    return (
+        f"📊 *बुनियादी जानकारी रिपोर्ट (Basic Information Report)*\n\n"
+        f"📱 *फ़ोन नंबर:* `{phone_number}`\n\n"
+        f"🌍 *देश:* {info['country']}\n"
+        f"📡 *कैरियर:* {info['carrier']}\n"
+        f"🕐 *समय क्षेत्र:* {timezone_str}\n"
+        f"📞 *प्रकार:* {_legacy_number_type(info['number_type'])}\n"
+        f"🔢 *देश कोड:* +{info['country_code']}\n\n"
+        f"*फॉर्मेट भिन्नताएँ:*\n"
+        f"• अंतर्राष्ट्रीय: `{info['international_format']}`\n"
+        f"• राष्ट्रीय: `{info['national_format']}`\n"
+        f"• E164: `{info['e164_format']}`\n\n"
+        f"*सत्यापन:*\n"
+        f"• मान्य: {'✅ हाँ' if info['is_valid'] else '❌ नहीं'}\n"
+        f"• संभव: {'✅ हाँ' if info['is_possible'] else '❌ नहीं'}\n\n"
+        f"⚠️ *अस्वीकरण:* जानकारी सार्वजनिक रूप से उपलब्ध डेटा पर आधारित है।\n"
+        f"📅 रिपोर्ट जनरेट की गई: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}"
+    )
+
+
+def legacy_full_report(info, phone_number):
+    timezone_str = ', '.join(info['timezone']) if info['timezone'] else 'अज्ञात'
+    report = (
+        f"📊 *व्यापक जांच रिपोर्ट (COMPREHENSIVE INVESTIGATION REPORT)*\n"
+        f"{'='*40}\n\n"
+        f"🎯 *लक्ष्य नंबर:* `{phone_number}`\n\n"
+        f"*🔍 बुनियादी जानकारी*\n"
+        f"├─ देश: {info['country']}\n"
+        f"├─ देश कोड: +{info['country_code']}\n"
+        f"├─ कैरियर/ऑपरेटर: {info['carrier']}\n"
+        f"├─ समय क्षेत्र: {timezone_str}\n"
+        f"└─ नंबर प्रकार: {_legacy_number_type(info['number_type'])}\n\n"
+        f"*📋 फॉर्मेट भिन्नताएँ*\n"
+        f"├─ अंतर्राष्ट्रीय: `{info['international_format']}`\n"
+        f"├─ राष्ट्रीय: `{info['national_format']}`\n"
+        f"├─ E164: `{info['e164_format']}`\n"
+        f"└─ राष्ट्रीय नंबर: {info['national_number']}\n\n"
+        f"*✓ सत्यापन स्थिति*\n"
+        f"├─ मान्य नंबर: {'✅ हाँ' if info['is_valid'] else '❌ नहीं'}\n"
+        f"└─ संभव नंबर: {'✅ हाँ' if info['is_possible'] else '❌ नहीं'}\n\n"
+    )
+    links = _legacy_links(phone_number)
+    if links:
+        report += "*🔗 सर्च लिंक*\n"
+        for platform, link in links.items():
+            report += f"├─ [{platform}]({link})\n"
+        report += "\n"
+    report += (
+        f"*⚠️ महत्वपूर्ण अस्वीकरण*\n"
+        f"यह उपकरण केवल सार्वजनिक स्रोतों से जानकारी प्रदान करता है। "
+        f"यह ट्रैकिंग, हैकिंग, या वास्तविक समय स्थान डेटा प्रदान नहीं करता है। "
+        f"कृपया जिम्मेदारी और नैतिक रूप से उपयोग करें।\n\n"
+        f"📅 रिपोर्ट जनरेट की गई: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}\n"
+        f"🤖 बॉट स्थिति: ऑनलाइन 24/7"
+    )
+    return report
+
+
+def legacy_links_report(info, phone_number):
+    links = _legacy_links(phone_number)
+    report = (
+        f"🔗 *{phone_number} के लिए सर्च लिंक*\n\n"
+        f"इस नंबर को विभिन्न प्लेटफार्मों पर खोजने के लिए नीचे दिए गए किसी भी लिंक पर क्लिक करें:\n\n"
+    )
+    for platform, link in links.items():
+        report += f"🔹 [{platform}]({link})\n"
+    report += (
+        f"\n💡 *उपयोग के टिप्स:*\n"
+        f"• ये लिंक सार्वजनिक रूप से उपलब्ध जानकारी खोजते हैं\n"
+        f"• परिणाम प्लेटफॉर्म के अनुसार भिन्न हो सकते हैं\n"
+        f"• कुछ प्लेटफार्मों के लिए लॉगिन आवश्यक हो सकता है\n"
+        f"• सभी प्लेटफार्मों पर डेटा उपलब्ध नहीं हो सकता है\n\n"
+        f"⚠️ इन उपकरणों का जिम्मेदारी से उपयोग करें और गोपनीयता कानूनों का सम्मान करें।"
+    )
+    return report
+
+
+LEGACY = {'basic': legacy_basic_report, 'all': legacy_full_report, 'links': legacy_links_report}
+
+
+def _time_per_call(func, args_list, iterations, repeat=5):
+    """Best-of-repeat mean time per call in microseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(iterations):
+            func(*args_list[i % len(args_list)])
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e6
+
+
+def run(iterations):
+    bot = bot_module.PhoneNumberBot('123456:BENCH', metadata_mode='lazy')
+    samples = []
+    for number in NUMBERS:
+        parsed, _ = bot.validate_phone_number(number)
+        e164 = bot_module.phonenumbers.format_number(parsed, bot_module.phonenumbers.PhoneNumberFormat.E164)
+        samples.append((e164, bot.get_basic_info(parsed)))
+
+    results = {}
+    for report_type, legacy in LEGACY.items():
+        for e164, info in samples:
+            expected = _TIMESTAMP.sub('', legacy(info, e164))
+            actual = _TIMESTAMP.sub('', bot.render_report(report_type, e164, info))
+            if expected != actual:
+                raise AssertionError(f"{report_type} report for {e164} differs from the legacy output")
+
+        def template(e164, info, report_type=report_type):
+            return (bot_module.render_report_body(report_type, e164, info)
+                    + bot_module.render_report_footer(report_type))
+
+        def cached(e164, info, report_type=report_type):
+            return bot.cached_report(report_type, e164) or bot.render_report(report_type, e164, info)
+
+        results[report_type] = {
+            'legacy_us': _time_per_call(legacy, [(info, e164) for e164, info in samples], iterations),
+            'template_us': _time_per_call(template, samples, iterations),
+            'cached_us': _time_per_call(cached, samples, iterations)
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report rendering micro-benchmark")
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run(args.iterations)
+    print(f"{'report':<8}{'legacy µs':>12}{'template µs':>14}{'cached µs':>12}")
+    for report_type, r in results.items():
+        print(f"{report_type:<8}{r['legacy_us']:>12.2f}{r['template_us']:>14.2f}{r['cached_us']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
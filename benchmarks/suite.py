@@ -0,0 +1,323 @@
+"""Benchmark suite: validation, enrichment, report rendering and the full handler flow.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --compare baseline.json [--threshold 0.10]
+    python benchmarks/suite.py --compare baseline.json results.json
+
+Every run uses a seeded synthetic corpus of valid, possible-but-invalid,
+invalid and malformed numbers drawn from all supported regions, so two runs
+with the same --seed/--size measure exactly the same inputs. The handler flow
+(handle_phone_number followed by button_callback for each report) is driven
+by fake Update/Message/CallbackQuery objects whose Bot API methods are
+stubbed out, so nothing touches the network.
+
+In comparison mode each benchmark's --metric (p50 by default) is compared with
+the baseline; anything slower by more than --threshold is flagged and the
+process exits with status 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import phonenumbers  # noqa: E402
+from phonenumbers import PhoneNumberType  # noqa: E402
+
+import phone_lookup_bot as bot_module  # noqa: E402
+
+CATEGORIES = ('valid', 'possible', 'invalid', 'malformed')
+SAMPLE_TYPES = (PhoneNumberType.MOBILE, PhoneNumberType.FIXED_LINE, PhoneNumberType.TOLL_FREE)
+REPORT_TYPES = ('basic', 'all', 'links')
+
+
+def generate_corpus(size, seed=0):
+    """Return a seeded list of (category, text) pairs spread evenly over CATEGORIES and regions"""
+    rng = random.Random(seed)
+    examples = []
+    for region in sorted(phonenumbers.SUPPORTED_REGIONS):
+        for number_type in SAMPLE_TYPES:
+            example = phonenumbers.example_number_for_type(region, number_type)
+            if example is not None:
+                examples.append(phonenumbers.format_number(example, phonenumbers.PhoneNumberFormat.E164))
+
+    def mutate(base, keep_min=4):
+        keep = rng.randint(min(len(base), keep_min), len(base))
+        return base[:keep] + ''.join(rng.choice('0123456789') for _ in range(len(base) - keep))
+
+    def classify(text):
+        try:
+            parsed = phonenumbers.parse(text, None)
+        except phonenumbers.NumberParseException:
+            return 'malformed'
+        if phonenumbers.is_valid_number(parsed):
+            return 'valid'
+        if phonenumbers.is_possible_number(parsed):
+            return 'possible'
+        return 'invalid'
+
+    def malformed():
+        base = rng.choice(examples)
+        kind = rng.randrange(5)
+        if kind == 0:
+            return base.lstrip('+')                                   # missing country code prefix
+        if kind == 1:
+            return base[:rng.randint(2, 6)]                           # too short
+        if kind == 2:
+            return base[:4] + ''.join(rng.choice('abcxyz') for _ in range(6))
+        if kind == 3:
+            return '+' + ''.join(rng.choice('0123456789') for _ in range(rng.randint(18, 25)))
+        return rng.choice(('', 'hello', '++', '+ - ( )', 'call me maybe'))
+
+    per_category = {category: [] for category in CATEGORIES}
+    target = -(-size // len(CATEGORIES))
+    attempts = 0
+    while any(len(items) < target for items in per_category.values()) and attempts < size * 200:
+        attempts += 1
+        if len(per_category['malformed']) < target and attempts % 4 == 0:
+            per_category['malformed'].append(malformed())
+            continue
+        base = rng.choice(examples)
+        roll = rng.random()
+        if roll < 0.7:
+            text = mutate(base)
+        elif roll < 0.85:
+            text = base[:-rng.randint(1, 3)]
+        else:
+            text = base + rng.choice('0123456789')
+        category = classify(text)
+        if category != 'malformed' and len(per_category[category]) < target:
+            per_category[category].append(text)
+
+    corpus = [(category, text) for category in CATEGORIES for text in per_category[category]]
+    rng.shuffle(corpus)
+    return corpus[:size]
+
+
+def summarize(samples):
+    """Latency statistics in microseconds for a list of per-call durations in seconds"""
+    if not samples:
+        return {'n': 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1e6
+
+    return {
+        'n': len(ordered),
+        'mean_us': round(sum(ordered) / len(ordered) * 1e6, 2),
+        'p50_us': round(pct(50), 2),
+        'p95_us': round(pct(95), 2),
+        'p99_us': round(pct(99), 2),
+        'max_us': round(ordered[-1] * 1e6, 2)
+    }
+
+
+def time_each(func, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+class FakeMessage:
+    """Stand-in for telegram.Message that records replies instead of calling the Bot API"""
+
+    def __init__(self, text=None, log=None):
+        self.text = text
+        self.log = log if log is not None else []
+
+    async def reply_text(self, text, **kwargs):
+        self.log.append(('sendMessage', text, kwargs))
+        return FakeMessage(text, self.log)
+
+    async def edit_text(self, text, **kwargs):
+        self.log.append(('editMessageText', text, kwargs))
+        return self
+
+
+class FakeCallbackQuery:
+    """Stand-in for telegram.CallbackQuery with stubbed answer/edit calls"""
+
+    def __init__(self, data, user, log):
+        self.data = data
+        self.from_user = user
+        self.log = log
+        self.message = FakeMessage(None, log)
+
+    async def answer(self, text=None, **kwargs):
+        self.log.append(('answerCallbackQuery', text, kwargs))
+        return True
+
+    async def edit_message_text(self, text, **kwargs):
+        self.log.append(('editMessageText', text, kwargs))
+        return True
+
+
+def make_bot(executor):
+    bot = bot_module.PhoneNumberBot('123456:BENCH', executor_mode=executor, metadata_mode='prewarm')
+    bot.rate_limiter = bot_module.TokenBucketLimiter({})
+    return bot
+
+
+async def run_flow(bot, corpus):
+    """Drive handle_phone_number and then button_callback for every report the reply offers"""
+    handle, callback, flow = [], [], []
+    context = SimpleNamespace(bot=None, user_data={}, chat_data={})
+    for i, (_, text) in enumerate(corpus):
+        user = SimpleNamespace(id=i + 1, username=f'bench{i}', first_name='Bench')
+        log = []
+        update = SimpleNamespace(message=FakeMessage(text, log), effective_user=user,
+                                 effective_chat=SimpleNamespace(id=i + 1), callback_query=None)
+        flow_started = time.perf_counter()
+        await bot.handle_phone_number(update, context)
+        handle.append(time.perf_counter() - flow_started)
+
+        markup = next((kwargs['reply_markup'] for _, _, kwargs in log if kwargs.get('reply_markup')), None)
+        if markup is not None:
+            for row in markup.inline_keyboard:
+                data = row[0].callback_data
+                if data == 'cancel':
+                    continue
+                query = FakeCallbackQuery(data, user, log)
+                started = time.perf_counter()
+                await bot.button_callback(SimpleNamespace(callback_query=query, effective_user=user), context)
+                callback.append(time.perf_counter() - started)
+        flow.append(time.perf_counter() - flow_started)
+    return handle, callback, flow
+
+
+def run_suite(size, seed, executor):
+    corpus = generate_corpus(size, seed)
+    bot = make_bot(executor)
+    results = {}
+    try:
+        texts = [(text,) for _, text in corpus]
+        results['validate'] = summarize(time_each(bot.validate_phone_number, texts))
+        for category in CATEGORIES:
+            subset = [(text,) for c, text in corpus if c == category]
+            results[f'validate_{category}'] = summarize(time_each(bot.validate_phone_number, subset))
+
+        parsed = []
+        for _, text in corpus:
+            number, _ = bot.validate_phone_number(text)
+            if number is not None:
+                parsed.append((number,))
+        bot.lookup_cache.clear()
+        results['basic_info_cold'] = summarize(time_each(bot.get_basic_info, parsed))
+        results['basic_info_warm'] = summarize(time_each(bot.get_basic_info, parsed))
+
+        samples = [(number, phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164),
+                    bot.get_basic_info(number)) for (number,) in parsed]
+        bot.report_cache.clear()
+        results['report_basic'] = summarize(time_each(bot.generate_basic_info_report, samples))
+        results['report_all'] = summarize(time_each(bot.generate_full_report, samples))
+        results['report_links'] = summarize(time_each(bot.generate_links_report, [(e164,) for _, e164, _ in samples]))
+        results['report_basic_cached'] = summarize(time_each(bot.generate_basic_info_report, samples))
+
+        bot.lookup_cache.clear()
+        bot.report_cache.clear()
+        handle, callback, flow = asyncio.run(run_flow(bot, corpus))
+        results['handle_phone_number'] = summarize(handle)
+        results['button_callback'] = summarize(callback)
+        results['flow'] = summarize(flow)
+    finally:
+        bot.lookup_executor.shutdown()
+
+    counts = {category: sum(1 for c, _ in corpus if c == category) for category in CATEGORIES}
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'size': len(corpus),
+            'seed': seed,
+            'executor': executor,
+            'corpus': counts,
+            'python': platform.python_version(),
+            'phonenumbers': phonenumbers.__version__,
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+
+
+def compare(baseline, current, metric='p50_us', threshold=0.10):
+    """Return rows of (name, baseline, current, ratio, regressed) for benchmarks present in both"""
+    rows = []
+    for name, stats in current['results'].items():
+        old = baseline['results'].get(name, {}).get(metric)
+        new = stats.get(metric)
+        if not old or new is None:
+            continue
+        ratio = new / old
+        rows.append((name, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_results(report):
+    meta = report['meta']
+    print(f"corpus: {meta['size']} numbers (seed {meta['seed']}, {meta['corpus']}), executor: {meta['executor']}")
+    print(f"{'benchmark':<24}{'n':>7}{'mean µs':>11}{'p50 µs':>11}{'p95 µs':>11}{'p99 µs':>11}")
+    for name, r in report['results'].items():
+        if r.get('n'):
+            print(f"{name:<24}{r['n']:>7}{r['mean_us']:>11.1f}{r['p50_us']:>11.1f}{r['p95_us']:>11.1f}{r['p99_us']:>11.1f}")
+
+
+def print_comparison(rows, metric, threshold):
+    print(f"{'benchmark':<24}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, old, new, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<24}{old:>12.1f}{new:>12.1f}{(ratio - 1) * 100:>+8.1f}%{flag}")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) past {threshold:.0%} on {metric}: {', '.join(regressions)}")
+    else:
+        print(f"no regressions past {threshold:.0%} on {metric}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Phone lookup bot benchmark suite")
+    parser.add_argument('--size', type=int, default=2000, help="corpus size")
+    parser.add_argument('--seed', type=int, default=1, help="corpus seed")
+    parser.add_argument('--executor', choices=bot_module.LookupExecutor.MODES, default='thread')
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON to FILE")
+    parser.add_argument('--compare', metavar='FILE', nargs='+',
+                        help="BASELINE [CURRENT]: compare CURRENT (or a fresh run) against BASELINE")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument('--metric', choices=('mean_us', 'p50_us', 'p95_us', 'p99_us'), default='p50_us')
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes BASELINE and optionally CURRENT")
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[1], encoding='utf-8') as f:
+            report = json.load(f)
+    else:
+        report = run_suite(args.size, args.seed, args.executor)
+        print_results(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline['meta']['size'], baseline['meta']['seed']) != (report['meta']['size'], report['meta']['seed']):
+            print("warning: baseline was measured on a different corpus (size/seed)")
+        regressions = print_comparison(compare(baseline, report, args.metric, args.threshold), args.metric, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Local fake Telegram Bot API for testing the bot without network access.
+
+Implements the handful of Bot API methods the bot uses, serves updates via
+getUpdates (polling) or pushes them to the registered webhook, and measures
+update-to-reply latency and throughput for each delivery mode.
+
+    python fake_telegram.py --mode both --updates 500 --concurrency 20
+
+The bot is started as a subprocess with TELEGRAM_API_URL pointing here, so the
+exact production code path (phone_lookup_bot.py) is exercised.
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+import urllib.request
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger('fake_telegram')
+
+FAKE_TOKEN = '123456:FAKE-TOKEN'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Lookup', 'username': 'lookup_test_bot'}
+SAMPLE_NUMBERS = ['+14155552671', '+911234567890', '+442071838750', '+919876543210', '+61291234567']
+
+
+class FakeTelegramState:
+    """Shared state of the fake API: pending updates, webhook registration and call log"""
+
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.updates = []
+        self.next_update_id = 1
+        self.next_message_id = 1000
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.calls = []
+        self.injected = {}
+        self.first_reply = {}
+        self.completed = {}
+
+    def new_message(self, chat_id, text=None):
+        with self.lock:
+            self.next_message_id += 1
+            message_id = self.next_message_id
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER
+        }
+        if text is not None:
+            message['text'] = text
+        return message
+
+    def record(self, method, params):
+        now = time.perf_counter()
+        chat_id = params.get('chat_id')
+        with self.lock:
+            self.calls.append((now, method))
+            if chat_id in self.injected:
+                if method in ('sendMessage', 'sendDocument', 'editMessageText'):
+                    self.first_reply.setdefault(chat_id, now)
+                # The lookup is complete once the reply carrying the report keyboard is out,
+                # whether it was sent directly (fast path) or edited into a placeholder
+                if 'reply_markup' in params and chat_id not in self.completed:
+                    self.completed[chat_id] = now
+                    self.lock.notify_all()
+
+    def make_update(self, chat_id, text):
+        with self.lock:
+            update_id = self.next_update_id
+            self.next_update_id += 1
+        return {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}'},
+                'text': text
+            }
+        }
+
+
+def _parse_params(handler):
+    length = int(handler.headers.get('Content-Length') or 0)
+    body = handler.rfile.read(length) if length else b''
+    content_type = handler.headers.get('Content-Type', '')
+    params = {}
+    if content_type.startswith('application/json'):
+        params = json.loads(body or b'{}')
+    elif content_type.startswith('multipart/form-data'):
+        for name, value in re.findall(rb'name="([^"]+)"\r\n\r\n(.*?)\r\n--', body, re.S):
+            params[name.decode()] = value.decode('utf-8', 'replace')
+    else:
+        params = {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}
+    for key, value in list(params.items()):
+        if isinstance(value, str):
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                pass
+    return params
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            self.do_POST()
+
+        def do_POST(self):
+            method = self.path.rstrip('/').rsplit('/', 1)[-1]
+            params = _parse_params(self)
+            state.record(method, params)
+            result = self.dispatch(method, params)
+            payload = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def dispatch(self, method, params):
+            if method == 'getMe':
+                return BOT_USER
+            if method == 'getUpdates':
+                return self.get_updates(params)
+            if method == 'setWebhook':
+                with state.lock:
+                    state.webhook_url = params.get('url')
+                    state.webhook_secret = params.get('secret_token')
+                    state.lock.notify_all()
+                return True
+            if method in ('deleteWebhook', 'answerCallbackQuery', 'answerInlineQuery', 'setMyCommands'):
+                return True
+            if method in ('sendMessage', 'editMessageText', 'sendDocument'):
+                return state.new_message(params.get('chat_id'), params.get('text'))
+            return True
+
+        def get_updates(self, params):
+            offset = int(params.get('offset') or 0)
+            timeout = float(params.get('timeout') or 0)
+            limit = int(params.get('limit') or 100)
+            deadline = time.monotonic() + timeout
+            with state.lock:
+                state.updates = [u for u in state.updates if u['update_id'] >= offset]
+                while not state.updates and time.monotonic() < deadline:
+                    state.lock.wait(deadline - time.monotonic())
+                return state.updates[:limit]
+
+    return Handler
+
+
+class FakeTelegramServer:
+    """Threaded HTTP server implementing the fake Bot API on 127.0.0.1"""
+
+    def __init__(self, port=0):
+        self.state = FakeTelegramState()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Fake Telegram API listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def inject(self, chat_id, text):
+        """Queue an update for getUpdates, or push it to the webhook if one is registered"""
+        state = self.state
+        update = state.make_update(chat_id, text)
+        with state.lock:
+            state.injected[chat_id] = time.perf_counter()
+            webhook_url, secret = state.webhook_url, state.webhook_secret
+            if not webhook_url:
+                state.updates.append(update)
+                state.lock.notify_all()
+                return
+        request = urllib.request.Request(webhook_url, data=json.dumps(update).encode('utf-8'), method='POST')
+        request.add_header('Content-Type', 'application/json')
+        if secret:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', secret)
+        urllib.request.urlopen(request, timeout=30).read()
+
+    def wait_for(self, predicate, timeout):
+        deadline = time.monotonic() + timeout
+        with self.state.lock:
+            while not predicate(self.state):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.state.lock.wait(min(remaining, 0.1))
+        return True
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_benchmark(mode, updates, concurrency, startup_timeout=60, extra_env=None):
+    """Start the bot against a fresh fake API in the given mode and measure latency/throughput"""
+    server = FakeTelegramServer().start()
+    env = dict(os.environ)
+    env.update({
+        'BOT_TOKEN': FAKE_TOKEN,
+        'TELEGRAM_API_URL': server.url,
+        'BOT_MODE': mode,
+        'METADATA_MODE': env.get('METADATA_MODE', 'prewarm'),
+        # Measure the bot's own capacity rather than Telegram's global send limit
+        'OUTBOUND_GLOBAL_RATE': env.get('OUTBOUND_GLOBAL_RATE', '0')
+    })
+    if mode == 'webhook':
+        webhook_port = _free_port()
+        env.update({
+            'WEBHOOK_LISTEN': '127.0.0.1',
+            'WEBHOOK_PORT': str(webhook_port),
+            'WEBHOOK_URL': f"http://127.0.0.1:{webhook_port}",
+            'WEBHOOK_SECRET_TOKEN': 'fake-secret'
+        })
+    env.update(extra_env or {})
+
+    bot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'phone_lookup_bot.py')
+    bot = subprocess.Popen([sys.executable, bot_path], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if mode == 'webhook':
+            ready = server.wait_for(lambda s: s.webhook_url is not None, startup_timeout)
+            time.sleep(0.5)
+        else:
+            ready = server.wait_for(lambda s: any(m == 'getUpdates' for _, m in s.calls), startup_timeout)
+        if not ready:
+            raise RuntimeError(f"Bot did not become ready in {mode} mode within {startup_timeout}s")
+
+        started = time.perf_counter()
+        chat_ids = list(range(1, updates + 1))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda c: server.inject(c, SAMPLE_NUMBERS[c % len(SAMPLE_NUMBERS)]), chat_ids))
+        finished = server.wait_for(lambda s: len(s.completed) >= updates, 120)
+        elapsed = time.perf_counter() - started
+
+        state = server.state
+        with state.lock:
+            first = [state.first_reply[c] - state.injected[c] for c in chat_ids if c in state.first_reply]
+            done = [state.completed[c] - state.injected[c] for c in chat_ids if c in state.completed]
+            api_calls = len(state.calls)
+        return {
+            'mode': mode,
+            'updates': updates,
+            'completed': len(done),
+            'timed_out': not finished,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_per_s': round(len(done) / elapsed, 1) if elapsed else 0.0,
+            'first_reply_p50_ms': round(_percentile(first, 50) * 1000, 1),
+            'first_reply_p95_ms': round(_percentile(first, 95) * 1000, 1),
+            'reply_p50_ms': round(_percentile(done, 50) * 1000, 1),
+            'reply_p95_ms': round(_percentile(done, 95) * 1000, 1),
+            'reply_p99_ms': round(_percentile(done, 99) * 1000, 1),
+            'api_calls': api_calls
+        }
+    finally:
+        bot.terminate()
+        try:
+            bot.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API and polling/webhook latency benchmark")
+    parser.add_argument('--mode', choices=('polling', 'webhook', 'both'), default='both')
+    parser.add_argument('--updates', type=int, default=200, help="number of text updates to send")
+    parser.add_argument('--concurrency', type=int, default=10, help="parallel update senders")
+    parser.add_argument('--serve', type=int, metavar='PORT', help="only run the fake API on PORT until interrupted")
+    args = parser.parse_args(argv)
+
+    if args.serve is not None:
+        server = FakeTelegramServer(args.serve).start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+        return
+
+    modes = ('polling', 'webhook') if args.mode == 'both' else (args.mode,)
+    for mode in modes:
+        print(json.dumps(run_benchmark(mode, args.updates, args.concurrency)))
+
+
+if __name__ == '__main__':
+    main()
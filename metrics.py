@@ -0,0 +1,257 @@
+"""Minimal in-process metrics with a Prometheus text-format HTTP endpoint.
+
+Counters, gauges and latency histograms are kept in a Registry and rendered
+in the Prometheus exposition format on /metrics. Histograms also publish
+p50/p95/p99 estimates (interpolated from their buckets) as a companion
+`<name>_quantile` gauge, so percentiles can be read without a Prometheus server.
+
+Everything is thread-safe: handlers on the event loop and lookups on executor
+threads update the same registry. Values recorded inside process-pool workers
+stay in those processes and are not exported.
+"""
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from 100 µs up to 10 s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for n, v in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        suffix = '_total' if not self.name.endswith('_total') else ''
+        return [(f"{self.name}{suffix}", _format_labels(self.labels, values), value) for values, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labels, values), value) for values, value in items]
+
+
+class Histogram:
+    """Cumulative latency histogram with bucket-interpolated quantile estimates"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*label_values, value=time.perf_counter() - started)
+
+    def quantile(self, q, *label_values):
+        """Estimate quantile q from the buckets (linear interpolation within the bucket)"""
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None or series[2] == 0:
+                return None
+            counts, _, total = list(series[0]), series[1], series[2]
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for i, count in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            items = [(values, list(s[0]), s[1], s[2]) for values, s in self._series.items()]
+        out = []
+        for values, counts, total_sum, total_count in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                out.append((f"{self.name}_bucket", _format_labels(self.labels, values, [('le', _format_value(bound))]), cumulative))
+            out.append((f"{self.name}_sum", _format_labels(self.labels, values), total_sum))
+            out.append((f"{self.name}_count", _format_labels(self.labels, values), total_count))
+        return out
+
+    def quantile_samples(self):
+        with self._lock:
+            keys = list(self._series)
+        out = []
+        for values in keys:
+            for q in QUANTILES:
+                estimate = self.quantile(q, *values)
+                if estimate is not None:
+                    out.append((f"{self.name}_quantile", _format_labels(self.labels, values, [('quantile', q)]), estimate))
+        return out
+
+
+class Registry:
+    """Holds metrics and callbacks that report externally owned values at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, func):
+        """func() returns an iterable of (name, kind, help, labels dict, value)"""
+        with self._lock:
+            self._collectors.append(func)
+
+    def remove_collector(self, func):
+        with self._lock:
+            if func in self._collectors:
+                self._collectors.remove(func)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for metric in metrics:
+            family = metric.name + ('_total' if metric.kind == 'counter' and not metric.name.endswith('_total') else '')
+            lines.append(f"# HELP {family} {metric.help}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+            if metric.kind == 'histogram':
+                lines.append(f"# HELP {metric.name}_quantile {metric.help} (p50/p95/p99 estimated from buckets)")
+                lines.append(f"# TYPE {metric.name}_quantile gauge")
+                for name, labels, value in metric.quantile_samples():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+
+        families = {}
+        for collector in collectors:
+            try:
+                for name, kind, help_text, labels, value in collector():
+                    families.setdefault(name, (kind, help_text, []))[2].append((labels, value))
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+class ErrorCountingHandler(logging.Handler):
+    """Counts ERROR-level log records by the function that logged them"""
+
+    def __init__(self, counter):
+        super().__init__(level=logging.ERROR)
+        self.counter = counter
+
+    def emit(self, record):
+        self.counter.inc(record.funcName)
+
+
+def start_metrics_server(registry, host='127.0.0.1', port=9108):
+    """Serve registry.render() on http://host:port/metrics from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            payload = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,377 @@
+"""Flood-limit-aware scheduler for outgoing Bot API requests.
+
+Telegram limits how fast a bot may send: roughly 30 messages per second
+overall, about one per second in a private chat and 20 per minute in a group.
+Going faster gets 429 (RetryAfter) responses. ScheduledRequest wraps the real
+request backend and routes every chat-targeted call (messages, edits,
+documents, ...) through an OutboundScheduler, which:
+
+- paces sends with a global token bucket and one token bucket per chat
+- keeps each chat's sends in order, with one request in flight per chat
+- serves interactive traffic before bulk/progress traffic (see
+  outbound_priority), both across chats and within a chat
+- merges a queued edit of a message into a newer edit of the same message,
+  so only the latest text is sent and every caller gets its result
+- on 429, pauses that chat for retry_after (doubling on repeated 429s) and
+  retries the request instead of failing it
+
+Calls that are not tied to a chat (getMe, answerCallbackQuery,
+answerInlineQuery, webhook setup, ...) bypass the scheduler.
+"""
+import json
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from telegram.request import BaseRequest
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BULK: 'bulk'}
+
+OUTBOUND_PRIORITY = contextvars.ContextVar('outbound_priority', default=PRIORITY_INTERACTIVE)
+
+# Methods that deliver or change something in a chat and count against its flood limits
+SCHEDULED_METHODS = frozenset((
+    'sendMessage', 'sendDocument', 'sendPhoto', 'sendAudio', 'sendVideo', 'sendAnimation', 'sendVoice',
+    'sendSticker', 'sendMediaGroup', 'sendLocation', 'sendContact', 'sendChatAction', 'copyMessage',
+    'forwardMessage', 'editMessageText', 'editMessageCaption', 'editMessageReplyMarkup', 'editMessageMedia',
+    'deleteMessage'
+))
+EDIT_METHODS = frozenset(('editMessageText', 'editMessageCaption', 'editMessageReplyMarkup', 'editMessageMedia'))
+
+MAX_RETRY_DELAY = 60.0
+
+
+@contextmanager
+def outbound_priority(priority):
+    """Send requests made inside this block (in the current task) with the given priority"""
+    token = OUTBOUND_PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        OUTBOUND_PRIORITY.reset(token)
+
+
+class _Job:
+    __slots__ = ('url', 'method', 'request_data', 'timeouts', 'priority', 'chat', 'edit_key',
+                 'futures', 'enqueued', 'attempts')
+
+    def __init__(self, url, method, request_data, timeouts, priority, chat, edit_key):
+        self.url = url
+        self.method = method
+        self.request_data = request_data
+        self.timeouts = timeouts
+        self.priority = priority
+        self.chat = chat
+        self.edit_key = edit_key
+        self.futures = []
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class OutboundScheduler:
+    """Paces chat-targeted requests under global and per-chat rate limits
+
+    send is the coroutine function that actually performs a request:
+    send(url, method, request_data, **timeouts) -> (status, payload).
+    A rate of 0 disables that limit.
+    """
+
+    def __init__(self, send, global_rate=30.0, chat_rate=1.0, chat_burst=3, group_rate=20 / 60,
+                 group_burst=3, max_retries=3, max_chats=100000, wait_histogram=None):
+        self.send = send
+        self.global_rate = global_rate
+        self.chat_limits = {False: (chat_rate, chat_burst), True: (group_rate, group_burst)}
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.wait_histogram = wait_histogram
+
+        self._global = [float(max(1, global_rate)), time.monotonic()]
+        self._buckets = OrderedDict()     # chat -> [tokens, last refill, paused until, consecutive 429s]
+        self._queues = {}                 # chat -> one deque of jobs per priority
+        self._edits = {}                  # (chat, method, message_id) -> queued edit job
+        self._busy = set()                # chats with a request in flight
+        self._scheduled = set()           # chats present in _ready or _timers
+        self._ready = []                  # heap of (priority, seq, chat)
+        self._timers = []                 # heap of (ready at, seq, chat)
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner = None
+        self._inflight = set()
+
+        self.depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self.sent = {priority: 0 for priority in PRIORITY_NAMES}
+        self.merged = 0
+        self.retried = 0
+        self.rate_limited = 0
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=10.0):
+        """Flush queued requests (up to timeout seconds), then stop the dispatcher"""
+        deadline = time.monotonic() + timeout
+        while (self._queues or self._inflight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        for queues in self._queues.values():
+            for queue in queues:
+                for job in queue:
+                    for future in job.futures:
+                        if not future.done():
+                            future.set_exception(RuntimeError("Outbound scheduler stopped before the request was sent"))
+        self._queues.clear()
+
+    @staticmethod
+    def target(method, request_data):
+        """Return (chat key, message_id) for a scheduled request, or (None, None) to bypass"""
+        if method not in SCHEDULED_METHODS or request_data is None:
+            return None, None
+        params = request_data.json_parameters
+        chat = params.get('chat_id') or params.get('inline_message_id')
+        return chat, params.get('message_id')
+
+    async def submit(self, url, method, request_data, timeouts, priority=None):
+        """Queue a request and wait for its (status, payload)"""
+        api_method = url.rsplit('/', 1)[-1]
+        chat, message_id = self.target(api_method, request_data)
+        if chat is None or self._runner is None:
+            return await self.send(url, method, request_data, **timeouts)
+
+        priority = OUTBOUND_PRIORITY.get() if priority is None else priority
+        future = asyncio.get_running_loop().create_future()
+        edit_key = (chat, api_method, message_id) if api_method in EDIT_METHODS and message_id else None
+        queued = self._edits.get(edit_key) if edit_key else None
+        if queued is not None:
+            # The queued edit has not been sent yet, so only the newest content needs to go out
+            queued.request_data = request_data
+            queued.timeouts = timeouts
+            queued.futures.append(future)
+            self.merged += 1
+        else:
+            job = _Job(url, method, request_data, timeouts, priority, chat, edit_key)
+            job.futures.append(future)
+            if edit_key:
+                self._edits[edit_key] = job
+            queues = self._queues.get(chat)
+            if queues is None:
+                queues = self._queues[chat] = tuple(deque() for _ in PRIORITY_NAMES)
+            queues[priority].append(job)
+            self.depth[priority] += 1
+            self._schedule(chat)
+        return await future
+
+    def _head(self, chat):
+        queues = self._queues.get(chat)
+        if queues:
+            for queue in queues:
+                if queue:
+                    return queue[0]
+        return None
+
+    def _bucket(self, chat, now):
+        bucket = self._buckets.get(chat)
+        if bucket is None:
+            rate, burst = self.chat_limits[str(chat).startswith('-')]
+            bucket = self._buckets[chat] = [float(burst), now, 0.0, 0]
+            if len(self._buckets) > self.max_chats:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chat)
+        return bucket
+
+    def _chat_wait(self, chat, now):
+        """Seconds until chat may send again (refilling its bucket as a side effect)"""
+        bucket = self._bucket(chat, now)
+        rate, burst = self.chat_limits[str(chat).startswith('-')]
+        if rate > 0:
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        wait = max(0.0, bucket[2] - now)
+        if rate > 0 and bucket[0] < 1:
+            wait = max(wait, (1 - bucket[0]) / rate)
+        return wait
+
+    def _global_wait(self, now):
+        if self.global_rate <= 0:
+            return 0.0
+        tokens, last = self._global
+        tokens = min(float(max(1, self.global_rate)), tokens + (now - last) * self.global_rate)
+        self._global = [tokens, now]
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.global_rate
+
+    def _schedule(self, chat):
+        """Put chat on the ready heap (or the timer heap while it is rate limited)"""
+        if chat in self._scheduled or chat in self._busy:
+            return
+        head = self._head(chat)
+        if head is None:
+            return
+        now = time.monotonic()
+        wait = self._chat_wait(chat, now)
+        if wait > 0:
+            heapq.heappush(self._timers, (now + wait, next(self._seq), chat))
+        else:
+            heapq.heappush(self._ready, (head.priority, next(self._seq), chat))
+        self._scheduled.add(chat)
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, chat = heapq.heappop(self._timers)
+                self._scheduled.discard(chat)
+                self._schedule(chat)
+            if not self._ready:
+                self._wakeup.clear()
+                timeout = self._timers[0][0] - now if self._timers else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            global_wait = self._global_wait(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            priority, _, chat = heapq.heappop(self._ready)
+            self._scheduled.discard(chat)
+            head = self._head(chat)
+            if head is None or chat in self._busy:
+                continue
+            if head.priority != priority:
+                self._schedule(chat)
+                continue
+            if self._chat_wait(chat, now) > 0:
+                self._schedule(chat)
+                continue
+
+            self._global[0] -= 1
+            self._buckets[chat][0] -= 1
+            queues = self._queues[chat]
+            job = queues[head.priority].popleft()
+            self.depth[job.priority] -= 1
+            if job.edit_key:
+                self._edits.pop(job.edit_key, None)
+            self._busy.add(chat)
+            task = asyncio.create_task(self._send(job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, job):
+        chat = job.chat
+        if self.wait_histogram is not None and job.attempts == 0:
+            self.wait_histogram.observe(PRIORITY_NAMES[job.priority], value=time.monotonic() - job.enqueued)
+        requeued = False
+        try:
+            status, payload = await self.send(job.url, job.method, job.request_data, **job.timeouts)
+            if status == 429:
+                self.rate_limited += 1
+                if job.attempts < self.max_retries:
+                    self._back_off(job, payload)
+                    requeued = True
+                    return
+            bucket = self._buckets.get(chat)
+            if bucket is not None:
+                bucket[3] = 0
+            self.sent[job.priority] += 1
+            for future in job.futures:
+                if not future.done():
+                    future.set_result((status, payload))
+        except Exception as e:
+            for future in job.futures:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._busy.discard(chat)
+            if not requeued and self._head(chat) is None:
+                self._queues.pop(chat, None)
+            self._schedule(chat)
+
+    def _back_off(self, job, payload):
+        """Pause job's chat for the server's retry_after (doubled on each repeat) and requeue job first"""
+        try:
+            retry_after = float(json.loads(payload)['parameters']['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            retry_after = 1.0
+        bucket = self._bucket(job.chat, time.monotonic())
+        delay = min(MAX_RETRY_DELAY, retry_after * (2 ** bucket[3]))
+        bucket[2] = time.monotonic() + delay
+        bucket[3] += 1
+        job.attempts += 1
+        self.retried += 1
+        self._queues[job.chat][job.priority].appendleft(job)
+        self.depth[job.priority] += 1
+        if job.edit_key and job.edit_key not in self._edits:
+            self._edits[job.edit_key] = job
+        logger.warning(f"Flood limit hit for chat {job.chat}, retrying {job.url.rsplit('/', 1)[-1]} "
+                       f"in {delay:.1f}s (attempt {job.attempts})")
+
+    def stats(self):
+        return {
+            'depth': {PRIORITY_NAMES[p]: n for p, n in self.depth.items()},
+            'sent': {PRIORITY_NAMES[p]: n for p, n in self.sent.items()},
+            'chats_queued': len(self._queues),
+            'in_flight': len(self._inflight),
+            'merged': self.merged,
+            'retried': self.retried,
+            'rate_limited': self.rate_limited
+        }
+
+
+class ScheduledRequest(BaseRequest):
+    """Request backend that sends chat-targeted calls through an OutboundScheduler"""
+
+    def __init__(self, inner, **scheduler_options):
+        self.inner = inner
+        self.scheduler = OutboundScheduler(inner.do_request, **scheduler_options)
+
+    @property
+    def read_timeout(self):
+        return self.inner.read_timeout
+
+    async def initialize(self):
+        await self.inner.initialize()
+        self.scheduler.start()
+
+    async def shutdown(self):
+        await self.scheduler.stop()
+        await self.inner.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        timeouts = {'read_timeout': read_timeout, 'write_timeout': write_timeout,
+                    'connect_timeout': connect_timeout, 'pool_timeout': pool_timeout}
+        return await self.scheduler.submit(url, method, request_data, timeouts)
+
+
+def collect_scheduler_metrics(scheduler):
+    """Metric samples for Registry.add_collector"""
+    stats = scheduler.stats()
+    for priority, depth in stats['depth'].items():
+        yield 'bot_outbound_queue_depth', 'gauge', "Outbound requests waiting for a send slot", {'priority': priority}, depth
+    for priority, sent in stats['sent'].items():
+        yield 'bot_outbound_sent_total', 'counter', "Scheduled outbound requests completed", {'priority': priority}, sent
+    yield 'bot_outbound_chats_queued', 'gauge', "Chats with queued outbound requests", {}, stats['chats_queued']
+    yield 'bot_outbound_merged_edits_total', 'counter', "Edits merged into a newer edit of the same message", {}, stats['merged']
+    yield 'bot_outbound_retries_total', 'counter', "Requests retried after a flood-limit (429) response", {}, stats['retried']
+    yield 'bot_outbound_rate_limited_total', 'counter', "Flood-limit (429) responses received", {}, stats['rate_limited']
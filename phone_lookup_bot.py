@@ -1,12 +1,28 @@
 import os
 import re
+import sys
+import csv
+import json
+import time
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, InlineQueryHandler, ChosenInlineResultHandler
+from telegram.request import HTTPXRequest
+from telegram.helpers import escape_markdown
 import phonenumbers
-from phonenumbers import geocoder, carrier, timezone
+from metrics import Registry, ErrorCountingHandler, start_metrics_server
+from outbound import ScheduledRequest, PRIORITY_BULK, outbound_priority, collect_scheduler_metrics
+from stream_stats import StreamingStats, StatsErrorHandler, CURRENT_STATS, write_snapshot, WINDOWS as STATS_WINDOWS
 from datetime import datetime
 
+_PROCESS_START = time.perf_counter()
+
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -20,24 +36,1032 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = os.getenv('BOT_TOKEN', '8264207818:AAFksNtrsNSOfG1GCtDkpsuhGgZ463qX_Lg')
 ADMIN_ID = 8441069760
 
+# Update delivery: 'polling' (getUpdates) or 'webhook' (Telegram pushes updates to us)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8443')))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'webhook').strip('/')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+# Bot API HTTP connection pool and number of updates processed concurrently
+CONNECTION_POOL_SIZE = int(os.getenv('CONNECTION_POOL_SIZE', '256'))
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '16'))
+# Alternative Bot API server (e.g. a local Bot API server or fake_telegram.py)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+
+# Outbound flood limits (Telegram: ~30 messages/s overall, ~1/s per private chat, 20/min per group);
+# a rate of 0 disables that limit
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', '3'))
+OUTBOUND_GROUP_PER_MINUTE = float(os.getenv('OUTBOUND_GROUP_PER_MINUTE', '20'))
+OUTBOUND_GROUP_BURST = int(os.getenv('OUTBOUND_GROUP_BURST', '3'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))
+
+# Prometheus metrics endpoint, bound to localhost by default; METRICS_PORT=0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+# Worker sharding (see sharding.py): SHARD_WORKERS > 0 runs a front process that dispatches
+# updates to that many workers; SHARD_TRANSPORT 'local' runs the workers in-process for testing
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+SHARD_TRANSPORT = os.getenv('SHARD_TRANSPORT', 'process')
+
+# Lookup cache configuration (set LOOKUP_CACHE_SIZE=0 to disable caching)
+LOOKUP_CACHE_SIZE = int(os.getenv('LOOKUP_CACHE_SIZE', '10000'))
+LOOKUP_CACHE_TTL = float(os.getenv('LOOKUP_CACHE_TTL', '3600'))
+
+# Executor for blocking phonenumbers lookups: 'thread', 'process' or 'inline'
+LOOKUP_EXECUTOR = os.getenv('LOOKUP_EXECUTOR', 'thread')
+LOOKUP_WORKERS = int(os.getenv('LOOKUP_WORKERS', '4'))
+LOOKUP_MAX_PENDING = int(os.getenv('LOOKUP_MAX_PENDING', '256'))
+
+# Metadata loading: 'prewarm' loads the regions/languages below before polling starts,
+# 'lazy' defers even the geocoder/carrier/timezone imports to the first lookup
+METADATA_MODE = os.getenv('METADATA_MODE', 'prewarm')
+PREWARM_REGIONS = [r.strip().upper() for r in os.getenv('PREWARM_REGIONS', 'IN,US').split(',') if r.strip()]
+PREWARM_LANGUAGES = [l.strip() for l in os.getenv('PREWARM_LANGUAGES', 'en').split(',') if l.strip()]
+
+# Optional compiled prefix index (built with `python prefix_index.py build`); empty to disable
+PREFIX_INDEX_PATH = os.getenv('PREFIX_INDEX_PATH', '')
+
+# Reply directly when work finishes within this many seconds; otherwise send a placeholder
+# first. 0 always sends the placeholder (one extra round trip per lookup).
+FAST_PATH_DEADLINE = float(os.getenv('FAST_PATH_DEADLINE', '0.5'))
+
+# Reports: template locale (must be a key of REPORT_TEMPLATES) and rendered-report cache size (0 disables)
+REPORT_LOCALE = os.getenv('REPORT_LOCALE', 'hi')
+REPORT_CACHE_SIZE = int(os.getenv('REPORT_CACHE_SIZE', '5000'))
+
+# Inline mode: minimum digits before a query is parsed, debounce for partial numbers,
+# server-side result cache and the cache_time Telegram may cache answers for. Inline numbers
+# count towards /stats when a result is sent, which needs inline feedback enabled (@BotFather /setinlinefeedback)
+INLINE_MIN_DIGITS = 8
+INLINE_NON_DIGITS = re.compile(r'\D')
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', '0.4'))
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', '5000'))
+INLINE_RESULT_TTL = float(os.getenv('INLINE_RESULT_TTL', '300'))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '300'))
+INLINE_MAX_PENDING_USERS = 10000
+
+# Per-user token buckets: action -> (tokens refilled per second, burst size)
+RATE_LIMITS = {
+    'lookup': (0.5, 5),
+    'basic': (1.0, 5),
+    'all': (0.2, 3),
+    'links': (1.0, 5),
+    'bulk': (1 / 60, 2),
+    'inline': (3.0, 15)
+}
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv('RATE_LIMIT_MAX_BUCKETS', '100000'))
+RATE_LIMIT_IDLE_TTL = float(os.getenv('RATE_LIMIT_IDLE_TTL', '600'))
+
+# Admin /stats: sliding-window aggregates, optionally snapshotted to STATS_SNAPSHOT_PATH so they survive restarts
+STATS_SNAPSHOT_PATH = os.getenv('STATS_SNAPSHOT_PATH', '')
+STATS_SNAPSHOT_INTERVAL = float(os.getenv('STATS_SNAPSHOT_INTERVAL', '300'))
+STATS_TOP_N = 5
+STATS_KIND_LABELS = {
+    'handle_phone_number': 'lookups',
+    'button_callback': 'reports',
+    'inline_query': 'inline',
+    'chosen_inline_result': 'inline sent',
+    'handle_document': 'bulk'
+}
+
+# Free-form text: only messages with a run of 7+ digits (separators allowed) reach the lookup
+# handler, and at most MULTI_MAX_NUMBERS distinct numbers are looked up per message
+PHONE_CANDIDATE = re.compile(r'\d(?:[\s().\-/]*\d){6,}')
+MULTI_MAX_NUMBERS = int(os.getenv('MULTI_MAX_NUMBERS', '10'))
+
+# Bulk lookup via uploaded CSV/TXT documents
+BULK_MAX_FILE_SIZE = int(os.getenv('BULK_MAX_FILE_SIZE', str(5 * 1024 * 1024)))
+BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', '5000'))
+BULK_CHUNK_SIZE = 200
+BULK_MAX_PROGRESS_EDITS = 3
+BULK_PROGRESS_INTERVAL = 5.0
+BULK_BUSY_RETRY_DELAY = 0.5
+BATCH_CHUNK_SIZE = 1000
+BULK_CSV_HEADER = [
+    'input', 'e164', 'country', 'country_code', 'carrier', 'timezones', 'number_type',
+    'international_format', 'national_format', 'is_valid', 'is_possible', 'error'
+]
+
+# Process-wide metrics, exported on METRICS_HOST:METRICS_PORT
+METRICS = Registry()
+HANDLER_LATENCY = METRICS.histogram('bot_handler_duration_seconds', "Update handler latency in seconds", ('handler',))
+HANDLER_ERRORS = METRICS.counter('bot_handler_errors', "Exceptions escaping update handlers", ('handler',))
+UPDATES_IN_FLIGHT = METRICS.gauge('bot_updates_in_flight', "Updates currently being handled")
+UPDATES_IN_FLIGHT.set(value=0)
+# Individual phonenumbers calls take microseconds, so they get finer buckets than handlers
+LOOKUP_CALL_LATENCY = METRICS.histogram('phonenumbers_call_duration_seconds',
+                                        "phonenumbers call latency in seconds", ('call',),
+                                        buckets=(0.000005, 0.00001, 0.00002, 0.00005, 0.0001, 0.00025,
+                                                 0.0005, 0.001, 0.005, 0.025, 0.1, 0.5))
+API_LATENCY = METRICS.histogram('telegram_api_request_duration_seconds', "Bot API request latency in seconds", ('method',))
+API_ERRORS = METRICS.counter('telegram_api_errors', "Failed Bot API requests", ('method',))
+OUTBOUND_WAIT = METRICS.histogram('bot_outbound_wait_seconds', "Time outbound requests waited for a send slot",
+                                  ('priority',))
+LOGGED_ERRORS = METRICS.counter('bot_logged_errors', "Errors logged, by function", ('function',))
+logger.addHandler(ErrorCountingHandler(LOGGED_ERRORS))
+logger.addHandler(StatsErrorHandler())
+
 # Check if token is available
 if not BOT_TOKEN:
     logger.error("BOT_TOKEN environment variable not set, and default token is missing. The bot cannot start.")
     # This check is more for local development, deployed services should handle this gracefully.
 
+class LookupCache:
+    """Thread-safe LRU cache with per-entry TTL for lookup results keyed by (E164, locale)"""
+    
+    def __init__(self, max_size=LOOKUP_CACHE_SIZE, ttl=LOOKUP_CACHE_TTL):
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @property
+    def enabled(self):
+        return self.max_size > 0
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if self.ttl > 0 and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries when full"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Return a snapshot of cache counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+# geocoder, carrier and timezone pull in large prefix tables, so they are imported on demand
+geocoder = None
+carrier = None
+timezone = None
+
+
+def load_metadata_modules():
+    """Import the geocoder/carrier/timezone modules if they are not loaded yet"""
+    global geocoder, carrier, timezone
+    if timezone is None:
+        from phonenumbers import geocoder as _geocoder, carrier as _carrier, timezone as _timezone
+        geocoder, carrier = _geocoder, _carrier
+        timezone = _timezone
+
+
+_prefix_index = None
+_prefix_index_loaded = False
+
+
+def get_prefix_index():
+    """Open the compiled prefix index (PREFIX_INDEX_PATH) once per process, or return None"""
+    global _prefix_index, _prefix_index_loaded
+    if not _prefix_index_loaded:
+        _prefix_index_loaded = True
+        if PREFIX_INDEX_PATH:
+            try:
+                from prefix_index import PrefixIndex
+                _prefix_index = PrefixIndex(PREFIX_INDEX_PATH)
+                logger.info(f"Using prefix index {PREFIX_INDEX_PATH} (locale {_prefix_index.locale})")
+            except Exception as e:
+                logger.error(f"Could not load prefix index {PREFIX_INDEX_PATH}, falling back to phonenumbers: {e}")
+    return _prefix_index
+
+
+def prewarm_metadata(regions=PREWARM_REGIONS, languages=PREWARM_LANGUAGES):
+    """Load region metadata and geocoder/carrier/timezone prefix data ahead of the first lookup"""
+    started = time.perf_counter()
+    index = get_prefix_index()
+    if index is not None and set(languages) <= {index.locale}:
+        logger.info(f"Prewarm: opened prefix index in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for region in regions:
+            phonenumbers.example_number_for_type(region, phonenumbers.PhoneNumberType.MOBILE)
+        logger.info(f"Prewarm finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return time.perf_counter() - started
+    
+    load_metadata_modules()
+    logger.info(f"Prewarm: imported geocoder/carrier/timezone in {(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    number_types = (phonenumbers.PhoneNumberType.MOBILE, phonenumbers.PhoneNumberType.FIXED_LINE)
+    for region in regions:
+        region_started = time.perf_counter()
+        samples = [phonenumbers.example_number_for_type(region, t) for t in number_types]
+        samples = [n for n in samples if n is not None]
+        if not samples:
+            logger.warning(f"Prewarm: no example numbers for region {region!r}, skipping")
+            continue
+        for number in samples:
+            timezone.time_zones_for_number(number)
+            for language in languages:
+                geocoder.description_for_number(number, language)
+                carrier.name_for_number(number, language)
+        logger.info(f"Prewarm: region {region} ({', '.join(languages)}) loaded in "
+                    f"{(time.perf_counter() - region_started) * 1000:.1f} ms")
+    
+    elapsed = time.perf_counter() - started
+    logger.info(f"Prewarm finished in {elapsed * 1000:.1f} ms")
+    return elapsed
+
+
+def normalize_number(phone_number):
+    """Strip everything but digits and '+', the form validate_number parses"""
+    return re.sub(r'[^\d+]', '', phone_number)
+
+
+def validate_number(phone_number):
+    """Validate and parse a phone number, returning (parsed, error)"""
+    try:
+        cleaned = normalize_number(phone_number)
+        
+        if not cleaned.startswith('+'):
+            return None, "Phone number must start with + and country code"
+        
+        if len(cleaned) < 8:
+            return None, "Phone number is too short"
+        
+        parsed = phonenumbers.parse(cleaned, None)
+        
+        if phonenumbers.is_valid_number(parsed):
+            return parsed, None
+        else:
+            if phonenumbers.is_possible_number(parsed):
+                return parsed, "Number is possible but may not be valid"
+            return None, "Invalid phone number format"
+            
+    except phonenumbers.phonenumberutil.NumberParseException as e:
+        return None, f"Parse error: Could not recognize number: {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error in validate_phone_number: {e}")
+        return None, "Error processing phone number"
+
+
+# Display placeholder for a country or carrier the metadata doesn't know
+UNKNOWN_VALUE = "अज्ञात"
+
+
+def compute_basic_info(parsed_number, locale="en"):
+    """Run the geocoder/carrier/timezone lookups for a parsed number (uncached)"""
+    try:
+        country = UNKNOWN_VALUE
+        carrier_name = UNKNOWN_VALUE
+        timezones = []
+        with LOOKUP_CALL_LATENCY.time('number_type'):
+            number_type = phonenumbers.number_type(parsed_number)
+        with LOOKUP_CALL_LATENCY.time('region'):
+            # The number's own region: +1 may be CA or JM, +7 KZ, +44 JE/GG/IM
+            region = phonenumbers.region_code_for_number(parsed_number)
+        
+        index = get_prefix_index()
+        if index is not None and index.locale == locale:
+            try:
+                with LOOKUP_CALL_LATENCY.time('prefix_index'):
+                    country, carrier_name, timezones = index.describe(parsed_number, number_type)
+                country = country or UNKNOWN_VALUE
+                carrier_name = carrier_name or UNKNOWN_VALUE
+            except Exception as e:
+                logger.error(f"Error resolving number from prefix index: {e}")
+        else:
+            load_metadata_modules()
+            
+            try:
+                with LOOKUP_CALL_LATENCY.time('geocoder'):
+                    country = geocoder.description_for_number(parsed_number, locale) or UNKNOWN_VALUE
+            except Exception as e:
+                logger.error(f"Error getting country: {e}")
+            
+            try:
+                with LOOKUP_CALL_LATENCY.time('carrier'):
+                    carrier_name = carrier.name_for_number(parsed_number, locale) or UNKNOWN_VALUE
+            except Exception as e:
+                logger.error(f"Error getting carrier: {e}")
+            
+            try:
+                with LOOKUP_CALL_LATENCY.time('timezone'):
+                    timezones = timezone.time_zones_for_number(parsed_number) or []
+            except Exception as e:
+                logger.error(f"Error getting timezone: {e}")
+        
+        with LOOKUP_CALL_LATENCY.time('format_number'):
+            international_format = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.INTERNATIONAL)
+            national_format = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.NATIONAL)
+            e164_format = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
+        with LOOKUP_CALL_LATENCY.time('validity'):
+            is_possible = phonenumbers.is_possible_number(parsed_number)
+            is_valid = phonenumbers.is_valid_number(parsed_number)
+        
+        return {
+            'country': country,
+            'carrier': carrier_name,
+            'timezone': timezones,
+            'number_type': number_type,
+            'international_format': international_format,
+            'national_format': national_format,
+            'e164_format': e164_format,
+            'is_possible': is_possible,
+            'is_valid': is_valid,
+            'country_code': parsed_number.country_code,
+            'national_number': parsed_number.national_number,
+            'region': region
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in get_basic_info: {e}")
+        return None
+
+
+def validate_numbers(phone_numbers):
+    """Validate a batch of raw phone numbers, returning a list of (parsed, error)"""
+    return [validate_number(n) for n in phone_numbers]
+
+
+def extract_numbers(text, limit=MULTI_MAX_NUMBERS):
+    """Find the distinct phone numbers in free-form text and validate each
+    
+    Returns (results, truncated) where results is a list of (raw, parsed, error)
+    with at most limit entries. Text without any recognisable international
+    number is validated as a whole, so the user still gets a specific error.
+    """
+    results = []
+    seen = set()
+    truncated = False
+    for match in phonenumbers.PhoneNumberMatcher(text, None, leniency=phonenumbers.Leniency.POSSIBLE):
+        e164 = phonenumbers.format_number(match.number, phonenumbers.PhoneNumberFormat.E164)
+        if e164 in seen:
+            continue
+        if len(results) >= limit:
+            truncated = True
+            break
+        seen.add(e164)
+        results.append((match.raw_string,) + validate_number(match.raw_string))
+    if not results:
+        results.append((text,) + validate_number(text))
+    return results, truncated
+
+
+def compute_basic_info_batch(parsed_numbers, locale="en"):
+    """Run compute_basic_info over a batch of parsed numbers"""
+    return [compute_basic_info(p, locale) for p in parsed_numbers]
+
+
+def bulk_result_row(raw_number, error, info):
+    """Build one output row (BULK_CSV_HEADER order) for a bulk or batch lookup result"""
+    if not info:
+        return [raw_number, '', '', '', '', '', '', '', '', False, False, error or '']
+    # Machine-readable output leaves unknown values empty rather than showing the chat placeholder
+    return [
+        raw_number,
+        info['e164_format'],
+        info['country'] if info['country'] != UNKNOWN_VALUE else '',
+        info['country_code'],
+        info['carrier'] if info['carrier'] != UNKNOWN_VALUE else '',
+        ';'.join(info['timezone']),
+        phonenumbers.PhoneNumberType.to_string(info['number_type']),
+        info['international_format'],
+        info['national_format'],
+        info['is_valid'],
+        info['is_possible'],
+        error or ''
+    ]
+
+
+def iter_input_numbers(stream):
+    """Yield non-empty, non-comment lines from a text stream"""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def chunked(iterable, size):
+    """Group an iterable into lists of at most size items"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def lookup_chunk(phone_numbers, locale="en"):
+    """Validate and enrich a chunk of raw numbers, returning result rows in input order"""
+    rows = []
+    for raw, (parsed, error) in zip(phone_numbers, validate_numbers(phone_numbers)):
+        info = compute_basic_info(parsed, locale) if parsed is not None else None
+        rows.append(bulk_result_row(raw, error, info))
+    return rows
+
+
+def run_batch(phone_numbers, workers=None, chunk_size=BATCH_CHUNK_SIZE, locale="en"):
+    """Stream result rows for phone_numbers, fanning chunks out over a process pool
+    
+    At most 2 * workers chunks are in flight and results are yielded in input order.
+    With workers=0 everything runs in the current process.
+    """
+    chunks = chunked(phone_numbers, chunk_size)
+    if workers == 0:
+        for chunk in chunks:
+            yield from lookup_chunk(chunk, locale)
+        return
+    
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_metadata_modules) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(lookup_chunk, chunk, locale))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def batch_main(args):
+    """Offline batch mode: read numbers from a file or stdin and write JSONL/CSV to stdout"""
+    started = time.perf_counter()
+    source = open(args.batch, encoding='utf-8', errors='replace') if args.batch != '-' else sys.stdin
+    rows = 0
+    try:
+        results = run_batch(iter_input_numbers(source), args.workers, args.chunk_size, args.locale)
+        if args.format == 'csv':
+            writer = csv.writer(sys.stdout)
+            writer.writerow(BULK_CSV_HEADER)
+            for row in results:
+                writer.writerow(row)
+                rows += 1
+        else:
+            for row in results:
+                sys.stdout.write(json.dumps(dict(zip(BULK_CSV_HEADER, row)), ensure_ascii=False) + '\n')
+                rows += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    
+    elapsed = time.perf_counter() - started
+    logger.info(f"Batch finished: {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+# Keyboard buttons carry the action and the E164 number (base36) so callbacks need no session state
+CALLBACK_ACTION_CODES = {'basic': 'b', 'all': 'a', 'links': 'l'}
+CALLBACK_ACTIONS = {code: action for action, code in CALLBACK_ACTION_CODES.items()}
+_BASE36_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def encode_callback_data(action, e164, in_list=False):
+    """Encode an action and E164 number as compact callback_data, e.g. 'a:6i3umcf' for +14155552671
+    
+    Buttons under a multi-number list use the upper-case action code ('A:6i3umcf').
+    """
+    value = int(e164.lstrip('+'))
+    encoded = ''
+    while value:
+        value, digit = divmod(value, 36)
+        encoded = _BASE36_DIGITS[digit] + encoded
+    code = CALLBACK_ACTION_CODES[action]
+    return f"{code.upper() if in_list else code}:{encoded or '0'}"
+
+
+def decode_callback_data(data):
+    """Return (action, e164, in_list) from callback_data; e164 is None for data without a number"""
+    code, _, encoded = data.partition(':')
+    if code.lower() not in CALLBACK_ACTIONS or not encoded:
+        return data, None, False
+    try:
+        return CALLBACK_ACTIONS[code.lower()], f"+{int(encoded, 36)}", code.isupper()
+    except ValueError:
+        return data, None, False
+
+
+SEARCH_LINK_TEMPLATES = (
+    ('Google', "https://www.google.com/search?q={encoded}"),
+    ('TrueCaller', "https://www.truecaller.com/search/in/{number_no_plus}"),
+    ('Facebook', "https://www.facebook.com/search/top/?q={encoded}"),
+    ('LinkedIn', "https://www.linkedin.com/search/results/all/?keywords={encoded}"),
+    ('Twitter (X)', "https://twitter.com/search?q={encoded}"),
+    ('Instagram (Tag)', "https://www.instagram.com/explore/tags/{number_no_plus}")
+)
+
+
+def _search_links_section(line):
+    """Expand the search link list into template text, leaving {encoded}/{number_no_plus} slots"""
+    return ''.join(line.replace('PLATFORM', platform).replace('LINK', url) for platform, url in SEARCH_LINK_TEMPLATES)
+
+
+# Locale-specific words and number type names used when filling report fields
+REPORT_STRINGS = {
+    'hi': {
+        'unknown': "अज्ञात",
+        'yes': "✅ हाँ",
+        'no': "❌ नहीं",
+        'number_types': {
+            0: "फिक्स्ड लाइन (Fixed Line)",
+            1: "मोबाइल (Mobile)",
+            2: "फिक्स्ड लाइन या मोबाइल (Fixed Line or Mobile)",
+            3: "टोल फ्री (Toll Free)",
+            4: "प्रीमियम रेट (Premium Rate)",
+            5: "साझा लागत (Shared Cost)",
+            6: "VoIP",
+            7: "व्यक्तिगत नंबर (Personal Number)",
+            8: "पेजर (Pager)",
+            9: "UAN",
+            10: "वॉयसमेल (Voicemail)",
+            -1: "अज्ञात (Unknown)"
+        },
+        'unknown_type': "अज्ञात (Unknown)"
+    }
+}
+
+# Report layouts per locale and report type. The body is cacheable per number; the
+# footer holds the generation timestamp and is rendered on every request (inline
+# results, which Telegram and the inline cache keep for minutes, leave it out).
+REPORT_TEMPLATES = {
+    'hi': {
+        'basic': {
+            'body': (
+                "📊 *बुनियादी जानकारी रिपोर्ट (Basic Information Report)*\n\n"
+                "📱 *फ़ोन नंबर:* `{phone_number}`\n\n"
+                "🌍 *देश:* {country}\n"
+                "📡 *कैरियर:* {carrier}\n"
+                "🕐 *समय क्षेत्र:* {timezones}\n"
+                "📞 *प्रकार:* {number_type}\n"
+                "🔢 *देश कोड:* +{country_code}\n\n"
+                "*फॉर्मेट भिन्नताएँ:*\n"
+                "• अंतर्राष्ट्रीय: `{international_format}`\n"
+                "• राष्ट्रीय: `{national_format}`\n"
+                "• E164: `{e164_format}`\n\n"
+                "*सत्यापन:*\n"
+                "• मान्य: {is_valid}\n"
+                "• संभव: {is_possible}\n\n"
+                "⚠️ *अस्वीकरण:* जानकारी सार्वजनिक रूप से उपलब्ध डेटा पर आधारित है।\n"
+            ),
+            'footer': "📅 रिपोर्ट जनरेट की गई: {generated_at}"
+        },
+        'all': {
+            'body': (
+                "📊 *व्यापक जांच रिपोर्ट (COMPREHENSIVE INVESTIGATION REPORT)*\n"
+                + "=" * 40 + "\n\n"
+                "🎯 *लक्ष्य नंबर:* `{phone_number}`\n\n"
+                "*🔍 बुनियादी जानकारी*\n"
+                "├─ देश: {country}\n"
+                "├─ देश कोड: +{country_code}\n"
+                "├─ कैरियर/ऑपरेटर: {carrier}\n"
+                "├─ समय क्षेत्र: {timezones}\n"
+                "└─ नंबर प्रकार: {number_type}\n\n"
+                "*📋 फॉर्मेट भिन्नताएँ*\n"
+                "├─ अंतर्राष्ट्रीय: `{international_format}`\n"
+                "├─ राष्ट्रीय: `{national_format}`\n"
+                "├─ E164: `{e164_format}`\n"
+                "└─ राष्ट्रीय नंबर: {national_number}\n\n"
+                "*✓ सत्यापन स्थिति*\n"
+                "├─ मान्य नंबर: {is_valid}\n"
+                "└─ संभव नंबर: {is_possible}\n\n"
+                "*🔗 सर्च लिंक*\n"
+                + _search_links_section("├─ [PLATFORM](LINK)\n") + "\n"
+                "*⚠️ महत्वपूर्ण अस्वीकरण*\n"
+                "यह उपकरण केवल सार्वजनिक स्रोतों से जानकारी प्रदान करता है। "
+                "यह ट्रैकिंग, हैकिंग, या वास्तविक समय स्थान डेटा प्रदान नहीं करता है। "
+                "कृपया जिम्मेदारी और नैतिक रूप से उपयोग करें।\n\n"
+            ),
+            'footer': "📅 रिपोर्ट जनरेट की गई: {generated_at}\n🤖 बॉट स्थिति: ऑनलाइन 24/7"
+        },
+        'links': {
+            'body': (
+                "🔗 *{phone_number} के लिए सर्च लिंक*\n\n"
+                "इस नंबर को विभिन्न प्लेटफार्मों पर खोजने के लिए नीचे दिए गए किसी भी लिंक पर क्लिक करें:\n\n"
+                + _search_links_section("🔹 [PLATFORM](LINK)\n") +
+                "\n💡 *उपयोग के टिप्स:*\n"
+                "• ये लिंक सार्वजनिक रूप से उपलब्ध जानकारी खोजते हैं\n"
+                "• परिणाम प्लेटफॉर्म के अनुसार भिन्न हो सकते हैं\n"
+                "• कुछ प्लेटफार्मों के लिए लॉगिन आवश्यक हो सकता है\n"
+                "• सभी प्लेटफार्मों पर डेटा उपलब्ध नहीं हो सकता है\n\n"
+                "⚠️ इन उपकरणों का जिम्मेदारी से उपयोग करें और गोपनीयता कानूनों का सम्मान करें।"
+            ),
+            'footer': ""
+        }
+    }
+}
+
+
+def render_report_body(report_type, phone_number, info, locale=REPORT_LOCALE):
+    """Fill the cacheable body of a report with str.format_map"""
+    words = REPORT_STRINGS[locale]
+    if info is None:
+        values = {
+            'phone_number': phone_number,
+            'encoded': phone_number.replace('+', '%2B').replace(' ', '+'),
+            'number_no_plus': phone_number.replace('+', '')
+        }
+    else:
+        values = {
+            'phone_number': phone_number,
+            'encoded': phone_number.replace('+', '%2B').replace(' ', '+'),
+            'number_no_plus': phone_number.replace('+', ''),
+            'country': info['country'],
+            'carrier': info['carrier'],
+            'timezones': ', '.join(info['timezone']) if info['timezone'] else words['unknown'],
+            'number_type': words['number_types'].get(info['number_type'], words['unknown_type']),
+            'country_code': info['country_code'],
+            'international_format': info['international_format'],
+            'national_format': info['national_format'],
+            'e164_format': info['e164_format'],
+            'national_number': info['national_number'],
+            'is_valid': words['yes'] if info['is_valid'] else words['no'],
+            'is_possible': words['yes'] if info['is_possible'] else words['no']
+        }
+    return REPORT_TEMPLATES[locale][report_type]['body'].format_map(values)
+
+
+_report_timestamp = (None, '')
+
+
+def render_report_footer(report_type, locale=REPORT_LOCALE):
+    """Render the per-request part of a report (generation timestamp, formatted once per second)"""
+    global _report_timestamp
+    second = int(time.time())
+    if _report_timestamp[0] != second:
+        _report_timestamp = (second, datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S UTC'))
+    return REPORT_TEMPLATES[locale][report_type]['footer'].format_map({'generated_at': _report_timestamp[1]})
+
+
+BUSY_MESSAGE = "⏳ सर्वर अभी व्यस्त है। कृपया कुछ क्षण बाद पुनः प्रयास करें।"
+RATE_LIMIT_MESSAGE = "⏳ बहुत अधिक अनुरोध। कृपया कुछ सेकंड रुककर पुनः प्रयास करें।"
+
+
+class LookupBusyError(Exception):
+    """Raised when too many lookups are already queued on the executor"""
+
+
+class LookupExecutor:
+    """Runs blocking phonenumbers calls off the event loop with bounded concurrency
+    
+    Modes: 'thread' (default), 'process' (for heavy batches; functions and
+    arguments must be picklable) or 'inline' (run directly on the loop).
+    """
+    
+    MODES = ('thread', 'process', 'inline')
+    
+    def __init__(self, mode=LOOKUP_EXECUTOR, workers=LOOKUP_WORKERS, max_pending=LOOKUP_MAX_PENDING):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown lookup executor mode: {mode!r} (expected one of {', '.join(self.MODES)})")
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.max_pending = max(self.workers, int(max_pending))
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+        self._semaphore = None
+    
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='lookup')
+        return self._executor
+    
+    async def run(self, func, *args):
+        """Run func(*args) on the executor, raising LookupBusyError when the queue is full"""
+        if self.mode == 'inline':
+            return func(*args)
+        
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise LookupBusyError(f"{self.pending} lookups already pending")
+        
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected
+        }
+
+
+class TokenBucketLimiter:
+    """Per-user token buckets, one per action, with a bounded number of tracked buckets"""
+    
+    def __init__(self, limits=RATE_LIMITS, max_buckets=RATE_LIMIT_MAX_BUCKETS, idle_ttl=RATE_LIMIT_IDLE_TTL):
+        self.limits = dict(limits)
+        self.max_buckets = max_buckets
+        self.idle_ttl = idle_ttl
+        self._buckets = OrderedDict()
+        self.allowed = {action: 0 for action in self.limits}
+        self.rejected = {action: 0 for action in self.limits}
+    
+    def allow(self, user_id, action):
+        """Take a token for (user_id, action); return (allowed, notify)
+        
+        notify is True only for the first rejection after an allowed request, so a
+        flooding user gets one notice instead of one reply per message.
+        """
+        if action not in self.limits:
+            return True, False
+        rate, burst = self.limits[action]
+        now = time.monotonic()
+        self._evict_idle(now)
+        key = (user_id, action)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(burst), now, False]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_buckets:
+                # An evicted bucket has been idle longest and would be (nearly) full anyway
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            self.allowed[action] += 1
+            return True, False
+        
+        self.rejected[action] += 1
+        notify = not bucket[2]
+        bucket[2] = True
+        return False, notify
+    
+    def _evict_idle(self, now, limit=8):
+        """Drop up to limit least recently used buckets that have been idle longer than idle_ttl"""
+        for _ in range(limit):
+            if not self._buckets:
+                return
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.idle_ttl:
+                return
+            del self._buckets[key]
+    
+    def stats(self):
+        return {
+            'buckets': len(self._buckets),
+            'allowed': dict(self.allowed),
+            'rejected': dict(self.rejected)
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight computation"""
+    
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def run(self, key, func, *args):
+        """Await func(*args), or join the computation already running for key
+        
+        Every caller waits through a shield, so cancelling one caller (the first one
+        included) leaves the shared computation running for the others.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+    
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark it retrieved so a failure every caller stopped waiting for isn't logged
+            task.exception()
+    
+    def stats(self):
+        return {'in_flight': len(self._inflight), 'calls': self.calls, 'coalesced': self.coalesced}
+
+
+class RequestTrace:
+    """Counts the Bot API round trips made while handling one update"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.api_calls = 0
+        self.placeholder = False
+        self.started = time.perf_counter()
+    
+    async def call(self, coro):
+        self.api_calls += 1
+        return await coro
+    
+    def log(self):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        path = 'placeholder' if self.placeholder else 'fast path'
+        logger.info(f"{self.name}: {self.api_calls} API round trips ({path}) in {elapsed:.1f} ms")
+
+
+# .../bot<token>/<method>; file downloads (.../file/bot<token>/<file path>) don't match
+_API_METHOD_URL = re.compile(r'(?<!/file)/bot[^/]+/([A-Za-z]+)$')
+
+
+def api_method_label(url):
+    """Bot API method of url for metric labels; all other URLs share 'file_download' so labels stay bounded"""
+    match = _API_METHOD_URL.search(url)
+    return match.group(1) if match else 'file_download'
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API latency and failures per API method"""
+    
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = api_method_label(url)
+        started = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            API_ERRORS.inc(api_method)
+            raise
+        finally:
+            API_LATENCY.observe(api_method, value=time.perf_counter() - started)
+        if status >= 400:
+            API_ERRORS.inc(api_method)
+        return status, payload
+
+
+def make_outbound_request(connection_pool_size=CONNECTION_POOL_SIZE):
+    """Instrumented Bot API request backend behind the flood-limit scheduler"""
+    return ScheduledRequest(
+        InstrumentedRequest(connection_pool_size=connection_pool_size),
+        global_rate=OUTBOUND_GLOBAL_RATE,
+        chat_rate=OUTBOUND_CHAT_RATE,
+        chat_burst=OUTBOUND_CHAT_BURST,
+        group_rate=OUTBOUND_GROUP_PER_MINUTE / 60,
+        group_burst=OUTBOUND_GROUP_BURST,
+        max_retries=OUTBOUND_MAX_RETRIES,
+        wait_histogram=OUTBOUND_WAIT
+    )
+
+
+def format_stats(stats, notes=()):
+    """Render the admin /stats report from StreamingStats; notes are shown under the title"""
+    summaries = [(label, stats.summary(seconds, STATS_TOP_N)) for label, seconds in STATS_WINDOWS]
+    events = ('error', 'invalid')
+    kinds = sorted({k for _, s in summaries for k in s['counts'] if k not in events})
+    
+    def row(label, values):
+        return f"{label:<12}" + ''.join(f"{v:>9}" for v in values)
+    
+    table = [row('', [label for label, _ in summaries])]
+    totals = [sum(n for k, n in s['counts'].items() if k not in events) for _, s in summaries]
+    table.append(row('requests', totals))
+    table.append(row('req/min', [f"{t / (s['seconds'] / 60):.1f}" for t, (_, s) in zip(totals, summaries)]))
+    table.append(row('users ~', [s['users'] for _, s in summaries]))
+    for kind in kinds:
+        table.append(row(f" {STATS_KIND_LABELS.get(kind, kind.replace('_command', ''))}"[:12],
+                         [s['counts'].get(kind, 0) for _, s in summaries]))
+    table.append(row('errors', [s['counts'].get('error', 0) for _, s in summaries]))
+    table.append(row('error %', [f"{s['counts'].get('error', 0) / t * 100:.1f}" if t else '-'
+                                 for t, (_, s) in zip(totals, summaries)]))
+    table.append(row('invalid', [s['counts'].get('invalid', 0) for _, s in summaries]))
+    
+    label, day = summaries[-1]
+    type_total = sum(day['types'].values())
+    types = sorted(day['types'].items(), key=lambda kv: kv[1], reverse=True)[:STATS_TOP_N]
+    words = REPORT_STRINGS[REPORT_LOCALE]
+    
+    def top(items):
+        return ', '.join(f"{escape_markdown(str(name))} ({n})" for name, n in items) or '-'
+    
+    uptime = int(time.time() - stats.started)
+    return '\n'.join([
+        "📊 *बॉट आँकड़े (Stats)*",
+        *notes,
+        "```",
+        *table,
+        "```",
+        f"*शीर्ष देश ({label}):* {top(day['countries'])}",
+        f"*शीर्ष कैरियर ({label}):* {top(day['carriers'])}",
+        f"*नंबर प्रकार ({label}):* " + (', '.join(
+            f"{escape_markdown(words['number_types'].get(t, words['unknown_type']))} {n / type_total * 100:.0f}%"
+            for t, n in types) or '-'),
+        "",
+        f"⏱ Uptime: {uptime // 3600}h {uptime % 3600 // 60}m · users ~ HyperLogLog, top-N ~ Space-Saving"
+    ])
+
+
 class PhoneNumberBot:
-    def __init__(self, token):
+    def __init__(self, token, cache_size=LOOKUP_CACHE_SIZE, cache_ttl=LOOKUP_CACHE_TTL,
+                 executor_mode=LOOKUP_EXECUTOR, executor_workers=LOOKUP_WORKERS,
+                 executor_max_pending=LOOKUP_MAX_PENDING, metadata_mode=METADATA_MODE,
+                 prewarm_regions=PREWARM_REGIONS, prewarm_languages=PREWARM_LANGUAGES, request=None,
+                 stats_snapshot_path=STATS_SNAPSHOT_PATH, shard=None):
         if not token:
             raise ValueError("Telegram Bot Token is required.")
+        if metadata_mode not in ('prewarm', 'lazy'):
+            raise ValueError(f"Unknown metadata mode: {metadata_mode!r} (expected 'prewarm' or 'lazy')")
             
         self.token = token
+        self.metadata_mode = metadata_mode
+        self.lookup_cache = LookupCache(cache_size, cache_ttl)
+        logger.info(f"Lookup cache: size={self.lookup_cache.max_size}, ttl={self.lookup_cache.ttl}s")
+        self.lookup_executor = LookupExecutor(executor_mode, executor_workers, executor_max_pending)
+        logger.info(f"Lookup executor: mode={self.lookup_executor.mode}, workers={self.lookup_executor.workers}, "
+                    f"max_pending={self.lookup_executor.max_pending}")
+        self.rate_limiter = TokenBucketLimiter(RATE_LIMITS if RATE_LIMIT_ENABLED else {})
+        self.report_flight = SingleFlight()
+        self.report_cache = LookupCache(REPORT_CACHE_SIZE, cache_ttl)
+        self.fast_path_deadline = FAST_PATH_DEADLINE
+        self.inline_cache = LookupCache(INLINE_CACHE_SIZE, INLINE_RESULT_TTL)
+        self._inline_latest = OrderedDict()
+        self.inline_debounced = 0
+        self.metrics_server = None
+        self.outbound = request or make_outbound_request()
+        # Several bots can share a process (SHARD_TRANSPORT=local); their samples are told apart by shard
+        self.shard = shard
+        self.stats = StreamingStats()
+        self.stats_snapshot_path = stats_snapshot_path
+        self._snapshot_task = None
+        if self.stats.load(stats_snapshot_path):
+            logger.info(f"Restored stats snapshot from {stats_snapshot_path}")
         try:
-            self.app = Application.builder().token(token).build()
+            # getUpdates keeps its own default request so long-poll waits stay out of the API latency histogram
+            builder = (
+                Application.builder()
+                .token(token)
+                .request(self.outbound)
+                .concurrent_updates(max(1, CONCURRENT_UPDATES))
+                .post_init(self.post_init)
+                .post_shutdown(self.post_shutdown)
+            )
+            if TELEGRAM_API_URL:
+                builder = builder.base_url(f"{TELEGRAM_API_URL.rstrip('/')}/bot")
+                builder = builder.base_file_url(f"{TELEGRAM_API_URL.rstrip('/')}/file/bot")
+            self.app = builder.build()
             logger.info("Bot application builder successful")
         except Exception as e:
             logger.error(f"Failed to build Application: {e}")
             raise
         
+        if metadata_mode == 'prewarm':
+            prewarm_metadata(prewarm_regions, prewarm_languages)
+        else:
+            logger.info("Metadata mode: lazy (geocoder/carrier/timezone load on first lookup)")
+        
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start command handler"""
         user = update.effective_user
@@ -85,6 +1109,13 @@ class PhoneNumberBot:
             "• Basic Info - त्वरित अवलोकन\n"
             "• All Features - सम्पूर्ण विश्लेषण\n"
             "• Search Links - सोशल मीडिया पर खोजें\n\n"
+            "*इनलाइन मोड:*\n"
+            "• किसी भी चैट में @बॉट के बाद नंबर लिखें, जैसे: @bot +14155552671\n\n"
+            "*एक साथ कई नंबर:*\n"
+            f"• एक संदेश में कई नंबर भेजें या संपर्क सूची पेस्ट करें (अधिकतम {MULTI_MAX_NUMBERS})\n\n"
+            "*बल्क जाँच:*\n"
+            "• नंबरों की CSV/TXT फ़ाइल भेजें (प्रति पंक्ति एक नंबर)\n"
+            "• परिणाम CSV फ़ाइल के रूप में वापस मिलेगा\n\n"
             "*टिप्स:*\n"
             "• हमेशा देश कोड शामिल करें\n"
             "• '+' प्रतीक से शुरू करें\n"
@@ -121,122 +1152,144 @@ class PhoneNumberBot:
     
     def validate_phone_number(self, phone_number):
         """Validate and parse phone number with improved error handling"""
+        return validate_number(phone_number)
+    
+    def get_basic_info(self, parsed_number, locale="en"):
+        """Get basic information, served from the lookup cache when possible"""
         try:
-            cleaned = re.sub(r'[^\d+]', '', phone_number)
+            cache_key = (phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164), locale)
+            cached = self.lookup_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
             
-            if not cleaned.startswith('+'):
-                return None, "Phone number must start with + and country code"
-            
-            if len(cleaned) < 8:
-                return None, "Phone number is too short"
-            
-            parsed = phonenumbers.parse(cleaned, None)
+            info = compute_basic_info(parsed_number, locale)
+            if info:
+                self.lookup_cache.set(cache_key, info)
+                return dict(info)
+            return None
             
-            if phonenumbers.is_valid_number(parsed):
-                return parsed, None
-            else:
-                if phonenumbers.is_possible_number(parsed):
-                    return parsed, "Number is possible but may not be valid"
-                return None, "Invalid phone number format"
-                
-        except phonenumbers.phonenumberutil.NumberParseException as e:
-            return None, f"Parse error: Could not recognize number: {str(e)}"
         except Exception as e:
-            logger.error(f"Unexpected error in validate_phone_number: {e}")
-            return None, "Error processing phone number"
+            logger.error(f"Error in get_basic_info: {e}")
+            return None
+    
+    async def validate_phone_number_async(self, phone_number):
+        """Validate a phone number on the lookup executor instead of the event loop"""
+        return await self.lookup_executor.run(validate_number, phone_number)
     
-    def get_basic_info(self, parsed_number):
-        """Get basic information with comprehensive error handling"""
+    async def extract_numbers_async(self, text):
+        """Extract and validate the numbers in a message on the lookup executor"""
+        return await self.lookup_executor.run(extract_numbers, text, MULTI_MAX_NUMBERS)
+    
+    async def get_basic_info_async(self, parsed_number, locale="en"):
+        """Get basic information on the lookup executor, checking the cache on the loop first"""
         try:
-            country = "अज्ञात"
-            carrier_name = "अज्ञात"
-            timezones = []
-            
-            try:
-                country = geocoder.description_for_number(parsed_number, "en") or "अज्ञात"
-            except Exception as e:
-                logger.error(f"Error getting country: {e}")
-            
-            try:
-                carrier_name = carrier.name_for_number(parsed_number, "en") or "अज्ञात"
-            except Exception as e:
-                logger.error(f"Error getting carrier: {e}")
-            
-            try:
-                timezones = timezone.time_zones_for_number(parsed_number) or []
-            except Exception as e:
-                logger.error(f"Error getting timezone: {e}")
-            
-            info = {
-                'country': country,
-                'carrier': carrier_name,
-                'timezone': timezones,
-                'number_type': phonenumbers.number_type(parsed_number),
-                'international_format': phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.INTERNATIONAL),
-                'national_format': phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.NATIONAL),
-                'e164_format': phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164),
-                'is_possible': phonenumbers.is_possible_number(parsed_number),
-                'is_valid': phonenumbers.is_valid_number(parsed_number),
-                'country_code': parsed_number.country_code,
-                'national_number': parsed_number.national_number
-            }
-            return info
-            
+            cache_key = (phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164), locale)
         except Exception as e:
-            logger.error(f"Error in get_basic_info: {e}")
+            logger.error(f"Error in get_basic_info_async: {e}")
             return None
+        
+        cached = self.lookup_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        info = await self.lookup_executor.run(compute_basic_info, parsed_number, locale)
+        if info:
+            self.lookup_cache.set(cache_key, info)
+            return dict(info)
+        return None
+    
+    def record_number_stats(self, info):
+        """Count a looked-up number by region, carrier and type for /stats
+        
+        Called by the handlers once per number a user sends (message, list, file row or
+        chosen inline result), not per report or inline keystroke, so report buttons, cache
+        hits and typing don't skew the mix.
+        """
+        carrier_name = info['carrier']
+        self.stats.record_number(
+            info['region'],
+            carrier_name if carrier_name != UNKNOWN_VALUE else None,
+            info['number_type']
+        )
     
     def get_search_links(self, phone_number):
         """Generate search engine links"""
         try:
-            number_no_plus = phone_number.replace('+', '') 
+            number_no_plus = phone_number.replace('+', '')
             encoded = phone_number.replace('+', '%2B').replace(' ', '+')
-            
-            links = {
-                'Google': f"https://www.google.com/search?q={encoded}",
-                'TrueCaller': f"https://www.truecaller.com/search/in/{number_no_plus}",
-                'Facebook': f"https://www.facebook.com/search/top/?q={encoded}",
-                'LinkedIn': f"https://www.linkedin.com/search/results/all/?keywords={encoded}",
-                'Twitter (X)': f"https://twitter.com/search?q={encoded}",
-                'Instagram (Tag)': f"https://www.instagram.com/explore/tags/{number_no_plus}"
+            return {
+                platform: url.format(encoded=encoded, number_no_plus=number_no_plus)
+                for platform, url in SEARCH_LINK_TEMPLATES
             }
-            return links
         except Exception as e:
             logger.error(f"Error generating search links: {e}")
             return {}
     
-    def format_number_type(self, number_type):
+    def format_number_type(self, number_type, locale=REPORT_LOCALE):
         """Convert number type enum to readable string"""
-        types = {
-            0: "फिक्स्ड लाइन (Fixed Line)",
-            1: "मोबाइल (Mobile)",
-            2: "फिक्स्ड लाइन या मोबाइल (Fixed Line or Mobile)",
-            3: "टोल फ्री (Toll Free)",
-            4: "प्रीमियम रेट (Premium Rate)",
-            5: "साझा लागत (Shared Cost)",
-            6: "VoIP",
-            7: "व्यक्तिगत नंबर (Personal Number)",
-            8: "पेजर (Pager)",
-            9: "UAN",
-            10: "वॉयसमेल (Voicemail)",
-            -1: "अज्ञात (Unknown)"
-        }
-        return types.get(number_type, "अज्ञात (Unknown)")
+        words = REPORT_STRINGS[locale]
+        return words['number_types'].get(number_type, words['unknown_type'])
+    
+    async def _await_with_deadline(self, task):
+        """Wait up to the fast-path deadline for task; return True if it finished in time"""
+        if self.fast_path_deadline <= 0:
+            return task.done()
+        done, _ = await asyncio.wait({task}, timeout=self.fast_path_deadline)
+        return bool(done)
     
     async def handle_phone_number(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle phone number input with comprehensive error handling"""
+        """Handle a message containing one or more phone numbers"""
+        trace = RequestTrace('handle_phone_number')
         try:
-            phone_number = update.message.text.strip()
+            text = update.message.text.strip()
             user = update.effective_user
             
-            logger.info(f"User {user.id} requested lookup for: {phone_number}")
+            logger.info(f"User {user.id} requested lookup for: {text}")
+            
+            allowed, notify = self.rate_limiter.allow(user.id, 'lookup')
+            if not allowed:
+                logger.warning(f"Rate limited lookup from user {user.id}")
+                if notify:
+                    await trace.call(update.message.reply_text(RATE_LIMIT_MESSAGE))
+                return
+            
+            # Only show a "processing" placeholder if extraction misses the fast-path deadline
+            extraction = asyncio.ensure_future(self.extract_numbers_async(text))
+            processing_msg = None
+            if not await self._await_with_deadline(extraction):
+                trace.placeholder = True
+                processing_msg = await trace.call(update.message.reply_text("🔍 फ़ोन नंबर का विश्लेषण हो रहा है... कृपया प्रतीक्षा करें।"))
+            
+            async def respond(text, **kwargs):
+                if processing_msg is not None:
+                    return await trace.call(processing_msg.edit_text(text, **kwargs))
+                return await trace.call(update.message.reply_text(text, **kwargs))
             
-            processing_msg = await update.message.reply_text("🔍 फ़ोन नंबर का विश्लेषण हो रहा है... कृपया प्रतीक्षा करें।")
+            try:
+                results, truncated = await extraction
+                if len(results) > 1:
+                    infos = await asyncio.gather(*(self.get_basic_info_async(parsed)
+                                                   for _, parsed, _ in results if parsed is not None))
+            except LookupBusyError as e:
+                logger.warning(f"Lookup rejected for user {user.id}: {e}")
+                await respond(BUSY_MESSAGE)
+                return
             
-            parsed, error = self.validate_phone_number(phone_number)
+            if len(results) > 1:
+                for _, parsed, _ in results:
+                    if parsed is None:
+                        self.stats.record_event('invalid')
+                for info in infos:
+                    if info:
+                        self.record_number_stats(info)
+                reply_text, reply_markup = self.format_multi_reply(results, infos, truncated)
+                await respond(reply_text, parse_mode='Markdown', reply_markup=reply_markup)
+                return
             
+            phone_number, parsed, error = results[0]
             if error and not parsed:
-                await processing_msg.edit_text(
+                self.stats.record_event('invalid')
+                await respond(
                     f"❌ {error}\n\n"
                     "कृपया देश कोड के साथ एक मान्य फ़ोन नंबर भेजें।\n"
                     "फ़ॉर्मेट: +[country code][number]\n"
@@ -244,13 +1297,11 @@ class PhoneNumberBot:
                 )
                 return
             
-            context.user_data['phone_number'] = phone_number
-            context.user_data['parsed_number'] = parsed
-            
+            e164 = phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
             keyboard = [
-                [InlineKeyboardButton("📋 बुनियादी जानकारी (Basic Info)", callback_data='basic')],
-                [InlineKeyboardButton("🔍 संपूर्ण जानकारी (All Features)", callback_data='all')],
-                [InlineKeyboardButton("🌐 सर्च लिंक (Search Links)", callback_data='links')],
+                [InlineKeyboardButton("📋 बुनियादी जानकारी (Basic Info)", callback_data=encode_callback_data('basic', e164))],
+                [InlineKeyboardButton("🔍 संपूर्ण जानकारी (All Features)", callback_data=encode_callback_data('all', e164))],
+                [InlineKeyboardButton("🌐 सर्च लिंक (Search Links)", callback_data=encode_callback_data('links', e164))],
                 [InlineKeyboardButton("❌ रद्द करें (Cancel)", callback_data='cancel')]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -259,7 +1310,7 @@ class PhoneNumberBot:
             if error:
                 status_text = f"⚠️ {error}"
             
-            await processing_msg.edit_text(
+            await respond(
                 f"{status_text}\n\n"
                 f"📱 नंबर: `{phone_number}`\n\n"
                 f"कृपया वह जानकारी चुनें जिसे आप प्राप्त करना चाहते हैं:",
@@ -267,184 +1318,690 @@ class PhoneNumberBot:
                 reply_markup=reply_markup
             )
             
+            # Fetched after replying so the user doesn't wait for it; this also warms the lookup
+            # cache for the report buttons. Skipped while the executor is saturated.
+            try:
+                info = await self.get_basic_info_async(parsed)
+            except LookupBusyError:
+                info = None
+            if info:
+                self.record_number_stats(info)
+            
         except Exception as e:
             logger.error(f"Error in handle_phone_number: {e}")
             try:
-                await update.message.reply_text(
+                await trace.call(update.message.reply_text(
                     "❌ आपके अनुरोध को संसाधित करते समय एक त्रुटि हुई। "
                     "कृपया एक मान्य फ़ोन नंबर के साथ पुनः प्रयास करें।"
-                )
+                ))
             except:
                 pass
+        finally:
+            trace.log()
     
+    def format_multi_reply(self, results, infos, truncated):
+        """Build the batched reply for a message with several numbers: one summary line and
+        one row of report buttons per number; infos holds the info of each parsed number in order"""
+        words = REPORT_STRINGS[REPORT_LOCALE]
+        infos = iter(infos)
+        lines = [f"📋 *{len(results)} नंबर मिले*", ""]
+        keyboard = []
+        for i, (raw, parsed, error) in enumerate(results, 1):
+            info = next(infos) if parsed is not None else None
+            if info is None:
+                lines.append(f"{i}. `{raw}` — ❌ {escape_markdown(error or words['unknown'])}")
+                continue
+            e164 = info['e164_format']
+            country = escape_markdown(info['country'])
+            carrier_name = escape_markdown(info['carrier'])
+            warning = " ⚠️" if error else ""
+            lines.append(f"{i}. `{e164}` — {country}, {carrier_name}, "
+                         f"{escape_markdown(self.format_number_type(info['number_type']))}{warning}")
+            keyboard.append([
+                InlineKeyboardButton(f"📋 {e164}", callback_data=encode_callback_data('basic', e164, in_list=True)),
+                InlineKeyboardButton("🔍 All", callback_data=encode_callback_data('all', e164, in_list=True)),
+                InlineKeyboardButton("🌐 Links", callback_data=encode_callback_data('links', e164, in_list=True))
+            ])
+        if truncated:
+            lines += ["", f"⚠️ केवल पहले {MULTI_MAX_NUMBERS} नंबर संसाधित किए गए।"]
+        if keyboard:
+            lines += ["", "किसी नंबर की रिपोर्ट के लिए नीचे बटन चुनें:"]
+        return '\n'.join(lines), InlineKeyboardMarkup(keyboard) if keyboard else None
+
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks with error handling"""
+        trace = RequestTrace('button_callback')
+        answered = None
+        in_list = False
         try:
             query = update.callback_query
-            await query.answer()
+            choice, phone_number, in_list = decode_callback_data(query.data)
             
-            choice = query.data
+            allowed, _ = self.rate_limiter.allow(query.from_user.id, choice)
+            if not allowed:
+                logger.warning(f"Rate limited {choice} request from user {query.from_user.id}")
+                await trace.call(query.answer(RATE_LIMIT_MESSAGE))
+                return
             
             if choice == 'cancel':
-                await query.edit_message_text("❌ ऑपरेशन रद्द किया गया।")
+                await asyncio.gather(
+                    trace.call(query.answer()),
+                    trace.call(query.edit_message_text("❌ ऑपरेशन रद्द किया गया।"))
+                )
                 return
             
-            phone_number = context.user_data.get('phone_number')
-            parsed_number = context.user_data.get('parsed_number')
-            
-            if not phone_number or not parsed_number:
-                await query.edit_message_text(
-                    "❌ सत्र समाप्त हो गया है। कृपया फ़ोन नंबर फिर से भेजें।"
+            # Keyboards sent before numbers were encoded in callback_data carry no number
+            if not phone_number:
+                await asyncio.gather(
+                    trace.call(query.answer()),
+                    trace.call(query.edit_message_text("❌ सत्र समाप्त हो गया है। कृपया फ़ोन नंबर फिर से भेजें।"))
                 )
                 return
+            parsed_number = phonenumbers.parse(phone_number, None)
             
-            await query.edit_message_text("⏳ जानकारी जुटाई जा रही है... कृपया प्रतीक्षा करें।")
+            # A multi-number list keeps its text and buttons: its reports go out as new messages
+            show = query.message.reply_text if in_list else query.edit_message_text
             
-            if choice == 'basic':
-                result = self.generate_basic_info_report(parsed_number, phone_number)
-            elif choice == 'all':
-                result = self.generate_full_report(parsed_number, phone_number)
-            elif choice == 'links':
-                result = self.generate_links_report(phone_number)
+            report = asyncio.ensure_future(self.report_flight.run(
+                (phone_number, choice), self.build_report, choice, parsed_number, phone_number
+            ))
+            if not await self._await_with_deadline(report):
+                # Slow path: acknowledge the press and show a placeholder while the report is built
+                trace.placeholder = True
+                if in_list:
+                    await trace.call(query.answer("⏳ जानकारी जुटाई जा रही है... कृपया प्रतीक्षा करें।"))
+                else:
+                    await asyncio.gather(
+                        trace.call(query.answer()),
+                        trace.call(query.edit_message_text("⏳ जानकारी जुटाई जा रही है... कृपया प्रतीक्षा करें।"))
+                    )
             else:
-                result = "❌ अमान्य विकल्प चुना गया।"
+                answered = asyncio.ensure_future(trace.call(query.answer()))
             
-            await query.edit_message_text(
+            try:
+                result = await report
+            except LookupBusyError as e:
+                logger.warning(f"Lookup rejected for {phone_number}: {e}")
+                result = BUSY_MESSAGE
+            
+            await trace.call(show(
                 result, 
                 parse_mode='Markdown', 
                 disable_web_page_preview=True
-            )
+            ))
             
             logger.info(f"Successfully processed {choice} request for {phone_number}")
             
         except Exception as e:
             logger.error(f"Error in button_callback: {e}")
             try:
-                await query.edit_message_text(
+                show = query.message.reply_text if in_list else query.edit_message_text
+                await trace.call(show(
                     "❌ जानकारी प्राप्त करते समय एक त्रुटि हुई। कृपया पुनः प्रयास करें।"
-                )
+                ))
             except:
                 pass
+        finally:
+            # The fast-path answer runs alongside the report; collect it even when the report failed
+            if answered is not None:
+                try:
+                    await answered
+                except Exception as e:
+                    logger.warning(f"Could not answer callback query: {e}")
+            trace.log()
+    
+    async def build_report(self, choice, parsed_number, phone_number):
+        """Compute the report text for a keyboard choice"""
+        if choice in CALLBACK_ACTION_CODES:
+            cached = self.cached_report(choice, phone_number)
+            if cached is not None:
+                return cached
+        
+        info = None
+        if choice in ('basic', 'all'):
+            info = await self.get_basic_info_async(parsed_number)
+        
+        # The report cache was checked above, so the generators go straight to rendering
+        if choice == 'basic':
+            return self.generate_basic_info_report(parsed_number, phone_number, info, check_cache=False)
+        elif choice == 'all':
+            return self.generate_full_report(parsed_number, phone_number, info, check_cache=False)
+        elif choice == 'links':
+            return self.generate_links_report(phone_number, check_cache=False)
+        return "❌ अमान्य विकल्प चुना गया।"
+    
+    def cached_report(self, report_type, phone_number, locale=REPORT_LOCALE):
+        """Return a report from the rendered-report cache with a fresh footer, or None"""
+        body = self.report_cache.get((phone_number, report_type, locale))
+        if body is None:
+            return None
+        return body + render_report_footer(report_type, locale)
+    
+    def render_report(self, report_type, phone_number, info=None, locale=REPORT_LOCALE):
+        """Render a report from its template and cache the body by (E164, type, locale)
+        
+        Callers check cached_report first; this always renders.
+        """
+        body = render_report_body(report_type, phone_number, info, locale)
+        self.report_cache.set((phone_number, report_type, locale), body)
+        return body + render_report_footer(report_type, locale)
     
-    def generate_basic_info_report(self, parsed_number, phone_number):
+    def report_body(self, report_type, phone_number, info=None, locale=REPORT_LOCALE):
+        """Return a report without its timestamp footer, for text that is cached after sending"""
+        key = (phone_number, report_type, locale)
+        body = self.report_cache.get(key)
+        if body is None:
+            body = render_report_body(report_type, phone_number, info, locale)
+            self.report_cache.set(key, body)
+        return body.rstrip()
+    
+    def generate_basic_info_report(self, parsed_number, phone_number, info=None, check_cache=True):
         """Generate basic information report"""
         try:
-            info = self.get_basic_info(parsed_number)
+            if check_cache:
+                cached = self.cached_report('basic', phone_number)
+                if cached is not None:
+                    return cached
+            
+            info = info or self.get_basic_info(parsed_number)
             
             if not info:
                 return "❌ इस नंबर के लिए जानकारी प्राप्त नहीं की जा सकी।"
             
-            timezone_str = ', '.join(info['timezone']) if info['timezone'] else 'अज्ञात'
-            
-            report = (
-                f"📊 *बुनियादी जानकारी रिपोर्ट (Basic Information Report)*\n\n"
-                f"📱 *फ़ोन नंबर:* `{phone_number}`\n\n"
-                f"🌍 *देश:* {info['country']}\n"
-                f"📡 *कैरियर:* {info['carrier']}\n"
-                f"🕐 *समय क्षेत्र:* {timezone_str}\n"
-                f"📞 *प्रकार:* {self.format_number_type(info['number_type'])}\n"
-                f"🔢 *देश कोड:* +{info['country_code']}\n\n"
-                f"*फॉर्मेट भिन्नताएँ:*\n"
-                f"• अंतर्राष्ट्रीय: `{info['international_format']}`\n"
-                f"• राष्ट्रीय: `{info['national_format']}`\n"
-                f"• E164: `{info['e164_format']}`\n\n"
-                f"*सत्यापन:*\n"
-                f"• मान्य: {'✅ हाँ' if info['is_valid'] else '❌ नहीं'}\n"
-                f"• संभव: {'✅ हाँ' if info['is_possible'] else '❌ नहीं'}\n\n"
-                f"⚠️ *अस्वीकरण:* जानकारी सार्वजनिक रूप से उपलब्ध डेटा पर आधारित है।\n"
-                f"📅 रिपोर्ट जनरेट की गई: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}"
-            )
-            
-            return report
+            return self.render_report('basic', phone_number, info)
             
         except Exception as e:
             logger.error(f"Error generating basic report: {e}")
             return "❌ रिपोर्ट जनरेट करने में त्रुटि। कृपया पुनः प्रयास करें।"
     
-    def generate_full_report(self, parsed_number, phone_number):
+    def generate_full_report(self, parsed_number, phone_number, info=None, check_cache=True):
         """Generate comprehensive report"""
         try:
-            info = self.get_basic_info(parsed_number)
+            if check_cache:
+                cached = self.cached_report('all', phone_number)
+                if cached is not None:
+                    return cached
+            
+            info = info or self.get_basic_info(parsed_number)
             
             if not info:
                 return "❌ इस नंबर के लिए जानकारी प्राप्त नहीं की जा सकी।"
             
-            timezone_str = ', '.join(info['timezone']) if info['timezone'] else 'अज्ञात'
-            
-            report = (
-                f"📊 *व्यापक जांच रिपोर्ट (COMPREHENSIVE INVESTIGATION REPORT)*\n"
-                f"{'='*40}\n\n"
-                f"🎯 *लक्ष्य नंबर:* `{phone_number}`\n\n"
-                f"*🔍 बुनियादी जानकारी*\n"
-                f"├─ देश: {info['country']}\n"
-                f"├─ देश कोड: +{info['country_code']}\n"
-                f"├─ कैरियर/ऑपरेटर: {info['carrier']}\n"
-                f"├─ समय क्षेत्र: {timezone_str}\n"
-                f"└─ नंबर प्रकार: {self.format_number_type(info['number_type'])}\n\n"
-                f"*📋 फॉर्मेट भिन्नताएँ*\n"
-                f"├─ अंतर्राष्ट्रीय: `{info['international_format']}`\n"
-                f"├─ राष्ट्रीय: `{info['national_format']}`\n"
-                f"├─ E164: `{info['e164_format']}`\n"
-                f"└─ राष्ट्रीय नंबर: {info['national_number']}\n\n"
-                f"*✓ सत्यापन स्थिति*\n"
-                f"├─ मान्य नंबर: {'✅ हाँ' if info['is_valid'] else '❌ नहीं'}\n"
-                f"└─ संभव नंबर: {'✅ हाँ' if info['is_possible'] else '❌ नहीं'}\n\n"
-            )
-            
-            links = self.get_search_links(phone_number)
-            if links:
-                report += "*🔗 सर्च लिंक*\n"
-                for platform, link in links.items():
-                    report += f"├─ [{platform}]({link})\n"
-                report += "\n"
-            
-            report += (
-                f"*⚠️ महत्वपूर्ण अस्वीकरण*\n"
-                f"यह उपकरण केवल सार्वजनिक स्रोतों से जानकारी प्रदान करता है। "
-                f"यह ट्रैकिंग, हैकिंग, या वास्तविक समय स्थान डेटा प्रदान नहीं करता है। "
-                f"कृपया जिम्मेदारी और नैतिक रूप से उपयोग करें।\n\n"
-                f"📅 रिपोर्ट जनरेट की गई: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}\n"
-                f"🤖 बॉट स्थिति: ऑनलाइन 24/7"
-            )
-            
-            return report
+            return self.render_report('all', phone_number, info)
             
         except Exception as e:
             logger.error(f"Error generating full report: {e}")
             return "❌ व्यापक रिपोर्ट जनरेट करने में त्रुटि। कृपया पुनः प्रयास करें।"
     
-    def generate_links_report(self, phone_number):
+    def generate_links_report(self, phone_number, check_cache=True):
         """Generate search links report"""
         try:
-            links = self.get_search_links(phone_number)
-            
-            if not links:
-                return "❌ सर्च लिंक जनरेट नहीं किए जा सके।"
-            
-            report = (
-                f"🔗 *{phone_number} के लिए सर्च लिंक*\n\n"
-                f"इस नंबर को विभिन्न प्लेटफार्मों पर खोजने के लिए नीचे दिए गए किसी भी लिंक पर क्लिक करें:\n\n"
-            )
+            if check_cache:
+                cached = self.cached_report('links', phone_number)
+                if cached is not None:
+                    return cached
             
-            for platform, link in links.items():
-                report += f"🔹 [{platform}]({link})\n"
+            return self.render_report('links', phone_number)
             
-            report += (
-                f"\n💡 *उपयोग के टिप्स:*\n"
-                f"• ये लिंक सार्वजनिक रूप से उपलब्ध जानकारी खोजते हैं\n"
-                f"• परिणाम प्लेटफॉर्म के अनुसार भिन्न हो सकते हैं\n"
-                f"• कुछ प्लेटफार्मों के लिए लॉगिन आवश्यक हो सकता है\n"
-                f"• सभी प्लेटफार्मों पर डेटा उपलब्ध नहीं हो सकता है\n\n"
-                f"⚠️ इन उपकरणों का जिम्मेदारी से उपयोग करें और गोपनीयता कानूनों का सम्मान करें।"
+        except Exception as e:
+            logger.error(f"Error generating links report: {e}")
+            return "❌ सर्च लिंक जनरेट करने में त्रुटि। कृपया पुनः प्रयास करें।"
+    
+    async def _run_bulk(self, func, *args):
+        """Run bulk work on the lookup executor, yielding to interactive lookups when it is busy"""
+        while True:
+            try:
+                return await self.lookup_executor.run(func, *args)
+            except LookupBusyError:
+                await asyncio.sleep(BULK_BUSY_RETRY_DELAY)
+    
+    async def lookup_numbers_bulk(self, phone_numbers, locale="en"):
+        """Validate a chunk of raw numbers and fetch info for the valid ones, using the cache
+        
+        Returns a list of (raw, parsed, error, info) in input order.
+        """
+        validated = await self._run_bulk(validate_numbers, phone_numbers)
+        
+        infos = [None] * len(validated)
+        misses = []
+        for i, (parsed, _) in enumerate(validated):
+            if parsed is None:
+                continue
+            key = (phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164), locale)
+            cached = self.lookup_cache.get(key)
+            if cached is not None:
+                infos[i] = cached
+            else:
+                misses.append((i, key, parsed))
+        
+        if misses:
+            computed = await self._run_bulk(compute_basic_info_batch, [p for _, _, p in misses], locale)
+            for (i, key, _), info in zip(misses, computed):
+                if info:
+                    self.lookup_cache.set(key, info)
+                infos[i] = info
+        
+        return [(raw, parsed, error, info) for raw, (parsed, error), info in zip(phone_numbers, validated, infos)]
+    
+    @staticmethod
+    def _iter_document_numbers(path):
+        """Yield candidate numbers from an uploaded CSV/TXT file, one per line (first non-empty cell)"""
+        with open(path, newline='', encoding='utf-8', errors='replace') as f:
+            for row in csv.reader(f):
+                cell = next((c.strip() for c in row if c.strip()), None)
+                if cell and any(ch.isdigit() for ch in cell):
+                    yield cell
+    
+    async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle bulk lookups from an uploaded CSV/TXT file and reply with a CSV report"""
+        user = update.effective_user
+        document = update.message.document
+        logger.info(f"User {user.id} uploaded {document.file_name} ({document.file_size} bytes) for bulk lookup")
+        
+        allowed, notify = self.rate_limiter.allow(user.id, 'bulk')
+        if not allowed:
+            logger.warning(f"Rate limited bulk upload from user {user.id}")
+            if notify:
+                await update.message.reply_text(RATE_LIMIT_MESSAGE)
+            return
+        
+        if document.file_size and document.file_size > BULK_MAX_FILE_SIZE:
+            await update.message.reply_text(
+                f"❌ फ़ाइल बहुत बड़ी है। अधिकतम आकार: {BULK_MAX_FILE_SIZE // 1024} KB"
             )
+            return
+        
+        progress_msg = await update.message.reply_text("📂 फ़ाइल प्राप्त हुई, नंबरों की जाँच हो रही है...")
+        
+        # Progress edits and the result file yield to interactive replies in the outbound queue
+        with tempfile.TemporaryDirectory(prefix='bulk_') as workdir, outbound_priority(PRIORITY_BULK):
+            try:
+                source_path = os.path.join(workdir, 'input')
+                result_path = os.path.join(workdir, 'result.csv')
+                file = await document.get_file()
+                await file.download_to_drive(source_path)
+                
+                stats = {'rows': 0, 'unique': 0, 'duplicates': 0, 'valid': 0, 'invalid': 0, 'truncated': False}
+                seen = set()
+                progress_edits = 0
+                last_progress = time.monotonic()
+                
+                with open(result_path, 'w', newline='', encoding='utf-8') as out:
+                    writer = csv.writer(out)
+                    writer.writerow(BULK_CSV_HEADER)
+                    
+                    # Repeats of an already queued number are dropped before any lookup work
+                    # and do not count towards BULK_MAX_ROWS
+                    chunk = []
+                    queued = set()
+                    numbers = self._iter_document_numbers(source_path)
+                    while True:
+                        raw = next(numbers, None)
+                        if raw is not None:
+                            key = normalize_number(raw)
+                            if key in queued:
+                                stats['rows'] += 1
+                                stats['duplicates'] += 1
+                                continue
+                            if len(queued) < BULK_MAX_ROWS:
+                                stats['rows'] += 1
+                                queued.add(key)
+                                chunk.append(raw)
+                                if len(chunk) < BULK_CHUNK_SIZE:
+                                    continue
+                            else:
+                                stats['truncated'] = True
+                        
+                        results = await self.lookup_numbers_bulk(chunk) if chunk else []
+                        chunk = []
+                        for raw_number, parsed, error, info in results:
+                            # Different spellings of one number only collapse once parsed
+                            key = info['e164_format'] if info else normalize_number(raw_number)
+                            if key in seen:
+                                stats['duplicates'] += 1
+                                continue
+                            seen.add(key)
+                            stats['unique'] += 1
+                            stats['valid' if info and info['is_valid'] else 'invalid'] += 1
+                            if info:
+                                self.record_number_stats(info)
+                            writer.writerow(bulk_result_row(raw_number, error, info))
+                        
+                        if raw is None or stats['truncated']:
+                            break
+                        
+                        now = time.monotonic()
+                        if progress_edits < BULK_MAX_PROGRESS_EDITS and now - last_progress >= BULK_PROGRESS_INTERVAL:
+                            progress_edits += 1
+                            last_progress = now
+                            await progress_msg.edit_text(f"⏳ {stats['rows']} पंक्तियाँ संसाधित हुईं...")
+                
+                summary = (
+                    f"✅ बल्क जाँच पूरी हुई\n\n"
+                    f"• पंक्तियाँ: {stats['rows']}\n"
+                    f"• अद्वितीय नंबर: {stats['unique']}\n"
+                    f"• डुप्लिकेट: {stats['duplicates']}\n"
+                    f"• मान्य: {stats['valid']}\n"
+                    f"• अमान्य: {stats['invalid']}"
+                )
+                if stats['truncated']:
+                    summary += f"\n\n⚠️ केवल पहले {BULK_MAX_ROWS} अद्वितीय नंबर संसाधित किए गए।"
+                
+                base_name = os.path.splitext(document.file_name or 'numbers')[0]
+                with open(result_path, 'rb') as result:
+                    await update.message.reply_document(result, filename=f"{base_name}_lookup.csv")
+                await progress_msg.edit_text(summary)
+                logger.info(f"Bulk lookup for user {user.id} finished: {stats}")
+                
+            except Exception as e:
+                logger.error(f"Error in handle_document: {e}")
+                try:
+                    await progress_msg.edit_text("❌ फ़ाइल संसाधित करते समय एक त्रुटि हुई। कृपया पुनः प्रयास करें।")
+                except:
+                    pass
+    
+    async def inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Answer inline queries (@bot +14155552671) with basic and full report articles"""
+        query = update.inline_query
+        text = query.query.strip()
+        
+        # Cheap pre-check before any parsing: a '+' followed by enough digits to be a number
+        digits = INLINE_NON_DIGITS.sub('', text)
+        if not text.startswith('+') or not INLINE_MIN_DIGITS <= len(digits) <= 15:
+            return
+        e164_guess = f"+{digits}"
+        user_id = query.from_user.id
+        
+        # Remember the newest query per user so a partial number can be dropped once more is typed
+        self._inline_latest[user_id] = query.id
+        self._inline_latest.move_to_end(user_id)
+        while len(self._inline_latest) > INLINE_MAX_PENDING_USERS:
+            self._inline_latest.popitem(last=False)
+        
+        try:
+            results = self.inline_cache.get(e164_guess)
+            if results is None:
+                allowed, _ = self.rate_limiter.allow(user_id, 'inline')
+                if not allowed:
+                    return
+                
+                parsed, error = await self.validate_phone_number_async(text)
+                if parsed is None:
+                    return
+                
+                if error:
+                    # Probably still typing: only answer if no newer query arrived meanwhile
+                    await asyncio.sleep(INLINE_DEBOUNCE)
+                    if self._inline_latest.get(user_id) != query.id:
+                        self.inline_debounced += 1
+                        return
+                
+                info = await self.get_basic_info_async(parsed)
+                if not info:
+                    return
+                
+                results = self.build_inline_results(parsed, info['e164_format'], info, error)
+                self.inline_cache.set(e164_guess, results)
             
-            return report
+            await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False)
             
+        except LookupBusyError:
+            return
         except Exception as e:
-            logger.error(f"Error generating links report: {e}")
-            return "❌ सर्च लिंक जनरेट करने में त्रुटि। कृपया पुनः प्रयास करें।"
+            logger.error(f"Error answering inline query: {e}")
+        finally:
+            if self._inline_latest.get(user_id) == query.id:
+                del self._inline_latest[user_id]
+    
+    async def chosen_inline_result(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Count the number behind an inline result the user actually sent"""
+        result = update.chosen_inline_result
+        _, _, digits = result.result_id.partition(':')
+        try:
+            info = await self.get_basic_info_async(phonenumbers.parse(f"+{digits}", None))
+        except LookupBusyError:
+            return
+        except Exception as e:
+            logger.error(f"Error recording chosen inline result {result.result_id}: {e}")
+            return
+        if info:
+            self.record_number_stats(info)
+    
+    def build_inline_results(self, parsed_number, e164, info, error=None):
+        """Build the basic and full report articles for an inline query"""
+        description = f"{info['country']} • {info['carrier']}"
+        if error:
+            description = f"⚠️ {error}"
+        return [
+            InlineQueryResultArticle(
+                id=f"basic:{e164[1:]}",
+                title=f"📋 {e164} - बुनियादी जानकारी (Basic Info)",
+                description=description,
+                input_message_content=InputTextMessageContent(
+                    self.report_body('basic', e164, info),
+                    parse_mode='Markdown',
+                    disable_web_page_preview=True
+                )
+            ),
+            InlineQueryResultArticle(
+                id=f"all:{e164[1:]}",
+                title=f"🔍 {e164} - संपूर्ण जानकारी (All Features)",
+                description=description,
+                input_message_content=InputTextMessageContent(
+                    self.report_body('all', e164, info),
+                    parse_mode='Markdown',
+                    disable_web_page_preview=True
+                )
+            )
+        ]
     
     async def lookup_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Lookup command handler"""
         try:
             await update.message.reply_text(
+                "📱 *फ़ोन नंबर जाँच*\n\n"
+                "कृपया देश कोड के साथ एक फ़ोन नंबर भेजें।\n"
+                "फ़ॉर्मेट: +[country code][number]\n"
+                "उदाहरण: +911234567890",
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.error(f"Error in lookup command: {e}")
+            await update.message.reply_text("Send a phone number with country code, e.g. +14155552671")
+
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Admin-only /stats: traffic, users, errors and lookup mix over sliding windows"""
+        try:
+            await update.message.reply_text(format_stats(self.stats), parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Error in stats command: {e}")
+            await update.message.reply_text("Stats are unavailable right now.")
+
+    async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE):
+        """Log errors raised while processing updates"""
+        logger.error(f"Update {update} caused error: {context.error}")
+    
+    async def post_init(self, application: Application):
+        """Register this bot's metrics and start periodic stats snapshots if a snapshot path is configured"""
+        METRICS.add_collector(self.export_metrics)
+        if self.stats_snapshot_path and STATS_SNAPSHOT_INTERVAL > 0:
+            self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+    
+    async def _snapshot_loop(self):
+        CURRENT_STATS.set(self.stats)
+        while True:
+            await asyncio.sleep(STATS_SNAPSHOT_INTERVAL)
+            await self.save_stats_snapshot()
+    
+    async def save_stats_snapshot(self):
+        """Copy the stats on the event loop, where they are recorded, and write the file off it"""
+        if not self.stats_snapshot_path:
+            return
+        try:
+            data = self.stats.snapshot()
+            await asyncio.get_running_loop().run_in_executor(None, write_snapshot, self.stats_snapshot_path, data)
+        except Exception as e:
+            logger.error(f"Could not save stats snapshot {self.stats_snapshot_path}: {e}")
+    
+    async def post_shutdown(self, application: Application):
+        """Release the lookup executor and save the stats snapshot when the application stops"""
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+        await self.save_stats_snapshot()
+        METRICS.remove_collector(self.export_metrics)
+        self.lookup_executor.shutdown()
+        logger.info(f"Lookup executor stopped: {self.lookup_executor.stats()}")
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+    
+    def instrumented(self, name, callback):
+        """Wrap a handler callback so its latency, failures and concurrency are recorded"""
+        async def handler(update, context):
+            # Left set for the rest of the update's task, so the application error handler's
+            # log record is counted against this bot too
+            CURRENT_STATS.set(self.stats)
+            user = update.effective_user
+            self.stats.record_request(name, user.id if user else None)
+            UPDATES_IN_FLIGHT.inc()
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                HANDLER_ERRORS.inc(name)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(name, value=time.perf_counter() - started)
+                UPDATES_IN_FLIGHT.dec()
+        return handler
+    
+    def export_metrics(self):
+        """collect_metrics with a shard label added when this bot is one of several workers"""
+        if self.shard is None:
+            yield from self.collect_metrics()
+            return
+        shard = str(self.shard)
+        for name, kind, help_text, labels, value in self.collect_metrics():
+            yield name, kind, help_text, {**labels, 'shard': shard}, value
+    
+    def collect_metrics(self):
+        """Report cache, executor, rate limiter and coalescing counters at scrape time"""
+        for name, cache in (('lookup', self.lookup_cache), ('report', self.report_cache), ('inline', self.inline_cache)):
+            stats = cache.stats()
+            labels = {'cache': name}
+            yield 'bot_cache_hits_total', 'counter', "Cache hits", labels, stats['hits']
+            yield 'bot_cache_misses_total', 'counter', "Cache misses", labels, stats['misses']
+            yield 'bot_cache_evictions_total', 'counter', "Cache evictions", labels, stats['evictions']
+            yield 'bot_cache_entries', 'gauge', "Entries currently cached", labels, stats['size']
+        executor = self.lookup_executor.stats()
+        yield 'bot_lookup_pending', 'gauge', "Lookups queued or running on the executor", {}, executor['pending']
+        yield 'bot_lookup_rejected_total', 'counter', "Lookups rejected because the executor was full", {}, executor['rejected']
+        limiter = self.rate_limiter.stats()
+        for action, count in limiter['rejected'].items():
+            yield 'bot_rate_limited_total', 'counter', "Requests rejected by the rate limiter", {'action': action}, count
+        flight = self.report_flight.stats()
+        yield 'bot_report_coalesced_total', 'counter', "Report requests served by an in-flight computation", {}, flight['coalesced']
+        yield 'bot_inline_debounced_total', 'counter', "Inline queries dropped by the debounce", {}, self.inline_debounced
+        if isinstance(self.outbound, ScheduledRequest):
+            yield from collect_scheduler_metrics(self.outbound.scheduler)
+    
+    def setup_handlers(self):
+        """Register all command, message and callback handlers"""
+        timed = self.instrumented
+        self.app.add_handler(CommandHandler("start", timed('start', self.start)))
+        self.app.add_handler(CommandHandler("help", timed('help_command', self.help_command)))
+        self.app.add_handler(CommandHandler("about", timed('about_command', self.about_command)))
+        self.app.add_handler(CommandHandler("lookup", timed('lookup_command', self.lookup_command)))
+        self.app.add_handler(CommandHandler("stats", timed('stats_command', self.stats_command),
+                                            filters=filters.User(user_id=ADMIN_ID)))
+        # Chatter without a digit run never reaches the handler: no parse, no API call
+        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & filters.Regex(PHONE_CANDIDATE),
+                                            timed('handle_phone_number', self.handle_phone_number)))
+        self.app.add_handler(MessageHandler(
+            filters.Document.FileExtension("csv") | filters.Document.FileExtension("txt"),
+            timed('handle_document', self.handle_document)
+        ))
+        self.app.add_handler(CallbackQueryHandler(timed('button_callback', self.button_callback)))
+        self.app.add_handler(InlineQueryHandler(timed('inline_query', self.inline_query)))
+        self.app.add_handler(ChosenInlineResultHandler(timed('chosen_inline_result', self.chosen_inline_result)))
+        self.app.add_error_handler(self.error_handler)
+    
+    def run(self, mode=BOT_MODE):
+        """Start the bot with long polling or as a webhook server"""
+        self.setup_handlers()
+        logger.info(f"Bot is starting in {mode} mode... (startup took {time.perf_counter() - _PROCESS_START:.2f}s, "
+                    f"metadata mode: {self.metadata_mode})")
+        self.metrics_server = start_metrics_endpoint(METRICS_PORT)
+        run_application(self.app, mode)
+
+
+def start_metrics_endpoint(port, host=METRICS_HOST):
+    """Start the metrics endpoint on host:port, or return None if disabled or the port is taken"""
+    if not port:
+        return None
+    try:
+        return start_metrics_server(METRICS, host, port)
+    except OSError as e:
+        logger.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+
+
+def run_application(app, mode=BOT_MODE):
+    """Run app with long polling or as a webhook server until it is stopped"""
+    if mode == 'webhook':
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL must be set to the bot's public base URL in webhook mode.")
+        webhook_url = f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+        logger.info(f"Listening for webhook updates on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=webhook_url,
+            secret_token=WEBHOOK_SECRET_TOKEN or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+    elif mode == 'polling':
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
+    else:
+        raise ValueError(f"Unknown BOT_MODE: {mode!r} (expected 'polling' or 'webhook')")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Phone Number Lookup Bot")
+    parser.add_argument('--batch', metavar='FILE', nargs='?', const='-',
+                        help="run offline batch lookups on FILE (or stdin) instead of starting the bot")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl', help="batch output format")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="batch worker processes (default: CPU count, 0 = single process)")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE, help="numbers per batch work unit")
+    parser.add_argument('--locale', default='en', help="language for country/carrier names")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.batch:
+        batch_main(args)
+        return
+    
+    if REPORT_LOCALE not in REPORT_TEMPLATES:
+        logger.critical(f"Unknown REPORT_LOCALE: {REPORT_LOCALE!r} (available: {', '.join(sorted(REPORT_TEMPLATES))})")
+        sys.exit(1)
+    
+    try:
+        if SHARD_WORKERS > 0:
+            from sharding import ShardedFront
+            ShardedFront(BOT_TOKEN, SHARD_WORKERS, SHARD_TRANSPORT).run()
+            return
+        bot = PhoneNumberBot(BOT_TOKEN)
+        bot.run()
+    except Exception as e:
+        logger.critical(f"Bot failed to start: {e}")
+        raise
+
+
+if __name__ == '__main__':
+    main()
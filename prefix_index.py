@@ -0,0 +1,361 @@
+"""Compact, memory-mapped prefix index for country/carrier/timezone resolution.
+
+The phonenumbers geocoder, carrier and timezone modules each keep their own
+prefix dictionary in memory and walk it separately for every lookup. This
+module compiles those three tables (for a single locale) into one sorted,
+array-backed index keyed by E164 digits, so a single longest-prefix match
+answers all three. The file is opened with mmap, so every worker process
+shares the same read-only pages.
+
+Build and verify:
+    python prefix_index.py build --locale en --output prefix_index.bin
+    python prefix_index.py verify --index prefix_index.bin
+"""
+import os
+import sys
+import mmap
+import json
+import time
+import random
+import struct
+import logging
+import argparse
+from array import array
+from bisect import bisect_left
+
+import phonenumbers
+from phonenumbers import PhoneNumberType
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PFXIDX01'
+NO_VALUE = 0xFFFFFFFF
+UNKNOWN_TIME_ZONES = ('Etc/Unknown',)
+TZ_SEPARATOR = '&'
+CARRIER_NUMBER_TYPES = (PhoneNumberType.MOBILE, PhoneNumberType.FIXED_LINE_OR_MOBILE, PhoneNumberType.PAGER)
+
+# Each table holds fixed-width records: uint64 prefix key + three uint32 string ids
+_KEY_FORMAT = 'Q'
+_VALUE_FORMAT = 'I'
+
+
+def _align(offset, boundary=8):
+    return (offset + boundary - 1) // boundary * boundary
+
+
+def build_prefix_index(output_path, locale="en"):
+    """Compile the phonenumbers geocoder/carrier/timezone data for locale into output_path"""
+    from phonenumbers import geocoder
+    from phonenumbers.prefix import _find_lang
+    from phonenumbers.geodata import GEOCODE_DATA
+    from phonenumbers.geodata.locale import LOCALE_DATA
+    from phonenumbers.carrierdata import CARRIER_DATA
+    from phonenumbers.tzdata import TIMEZONE_DATA
+    from phonenumbers.timezone import _country_level_time_zones_for_number
+
+    started = time.perf_counter()
+    geo = {}
+    for prefix, names in GEOCODE_DATA.items():
+        name = _find_lang(names, locale, None, None)
+        if name is not None:
+            geo[prefix] = name
+    carriers = {}
+    for prefix, names in CARRIER_DATA.items():
+        name = _find_lang(names, locale, None, None)
+        if name is not None:
+            carriers[prefix] = name
+    zones = {prefix: TZ_SEPARATOR.join(tz) for prefix, tz in TIMEZONE_DATA.items()}
+
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        if value is None:
+            return NO_VALUE
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    # Every prefix in the union inherits each field from its longest ancestor that has it,
+    # so one longest-prefix match on the union gives the same answer as three separate walks
+    def inherited(table, prefix):
+        for length in range(len(prefix), 0, -1):
+            value = table.get(prefix[:length])
+            if value is not None:
+                return value
+        return None
+
+    tables = {}
+    for prefix in set(geo) | set(carriers) | set(zones):
+        record = (
+            intern(inherited(geo, prefix)),
+            intern(inherited(carriers, prefix)),
+            intern(inherited(zones, prefix))
+        )
+        tables.setdefault(len(prefix), []).append((int(prefix), record))
+
+    region_names = {region: geocoder._region_display_name(region, locale) for region in LOCALE_DATA}
+    country_zones = {}
+    for country_code in phonenumbers.COUNTRY_CODE_TO_REGION_CODE:
+        country_zones[str(country_code)] = TZ_SEPARATOR.join(
+            _country_level_time_zones_for_number(phonenumbers.PhoneNumber(country_code=country_code, national_number=0))
+        )
+
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = array('I', [0])
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    header = {
+        'locale': locale,
+        'phonenumbers_version': phonenumbers.__version__,
+        'region_names': region_names,
+        'country_zones': country_zones,
+        'string_count': len(strings),
+        'tables': []
+    }
+
+    # Lay out arrays after the header; offsets are filled in once the header size is known
+    blobs = []
+    for length in sorted(tables, reverse=True):
+        entries = sorted(tables[length])
+        keys = array(_KEY_FORMAT, (key for key, _ in entries))
+        values = array(_VALUE_FORMAT)
+        for _, record in entries:
+            values.extend(record)
+        header['tables'].append({'length': length, 'count': len(entries)})
+        blobs.append(('keys', length, keys.tobytes()))
+        blobs.append(('values', length, values.tobytes()))
+    blobs.append(('string_offsets', None, string_offsets.tobytes()))
+    blobs.append(('strings', None, b''.join(encoded)))
+
+    def layout(header_size):
+        offset = _align(len(MAGIC) + 4 + header_size)
+        positions = []
+        for _, _, data in blobs:
+            positions.append(offset)
+            offset = _align(offset + len(data))
+        return positions
+
+    # The header embeds offsets, so iterate until its size is stable
+    header_bytes = b''
+    while True:
+        positions = layout(len(header_bytes))
+        for table in header['tables']:
+            table['keys'], table['values'] = None, None
+        for (kind, length, _), position in zip(blobs, positions):
+            if kind in ('keys', 'values'):
+                next(t for t in header['tables'] if t['length'] == length)[kind] = position
+            else:
+                header[kind] = position
+        new_header_bytes = json.dumps(header, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        if len(new_header_bytes) == len(header_bytes):
+            break
+        header_bytes = new_header_bytes
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for (_, _, data), position in zip(blobs, positions):
+            f.write(b'\0' * (position - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, output_path)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Built prefix index {output_path} ({os.path.getsize(output_path) / 1024 / 1024:.1f} MB, "
+                f"{sum(t['count'] for t in header['tables'])} prefixes, {len(strings)} strings) in {elapsed:.2f}s")
+    return output_path
+
+
+class PrefixIndex:
+    """Read-only, mmap-backed view of a prefix index built by build_prefix_index"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a prefix index file")
+        header_size, = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_size].decode('utf-8'))
+
+        self.locale = header['locale']
+        self.phonenumbers_version = header['phonenumbers_version']
+        self.region_names = header['region_names']
+        self.country_zones = header['country_zones']
+        if self.phonenumbers_version != phonenumbers.__version__:
+            logger.warning(f"Prefix index {path} was built with phonenumbers {self.phonenumbers_version}, "
+                           f"running {phonenumbers.__version__}; rebuild it to stay in sync")
+
+        view = memoryview(self._mmap)
+        key_size = array(_KEY_FORMAT).itemsize
+        value_size = array(_VALUE_FORMAT).itemsize
+        self._tables = []
+        for table in header['tables']:
+            count = table['count']
+            keys = view[table['keys']:table['keys'] + count * key_size].cast(_KEY_FORMAT)
+            values = view[table['values']:table['values'] + count * 3 * value_size].cast(_VALUE_FORMAT)
+            self._tables.append((table['length'], keys, values))
+        count = header['string_count']
+        self._string_offsets = view[header['string_offsets']:header['string_offsets'] + (count + 1) * value_size].cast(_VALUE_FORMAT)
+        self._strings_start = header['strings']
+
+    def _string(self, string_id):
+        if string_id == NO_VALUE:
+            return None
+        start = self._strings_start + self._string_offsets[string_id]
+        end = self._strings_start + self._string_offsets[string_id + 1]
+        return self._mmap[start:end].decode('utf-8')
+
+    def lookup(self, digits):
+        """Return (area, carrier, time zones) for the longest prefix of the E164 digits, or Nones"""
+        for length, keys, values in self._tables:
+            if length > len(digits):
+                continue
+            key = int(digits[:length])
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                return self._string(values[3 * i]), self._string(values[3 * i + 1]), self._string(values[3 * i + 2])
+        return None, None, None
+
+    def _country_name(self, numobj):
+        region_codes = phonenumbers.region_codes_for_country_code(numobj.country_code)
+        if len(region_codes) == 1:
+            return self.region_names.get(region_codes[0], "")
+        valid_region = "ZZ"
+        for region_code in region_codes:
+            if phonenumbers.is_valid_number_for_region(numobj, region_code):
+                if valid_region != "ZZ":
+                    return ""
+                valid_region = region_code
+        return self.region_names.get(valid_region, "")
+
+    def _country_time_zones(self, numobj):
+        zones = self.country_zones.get(str(numobj.country_code))
+        return tuple(zones.split(TZ_SEPARATOR)) if zones else UNKNOWN_TIME_ZONES
+
+    def describe(self, numobj, number_type=None):
+        """Return (country, carrier, time zones) matching geocoder.description_for_number,
+        carrier.name_for_number and timezone.time_zones_for_number for this index's locale"""
+        if number_type is None:
+            number_type = phonenumbers.number_type(numobj)
+        if number_type == PhoneNumberType.UNKNOWN:
+            return "", "", UNKNOWN_TIME_ZONES
+        if not phonenumbers.is_number_type_geographical(number_type, numobj.country_code):
+            carrier_name = ""
+            if number_type in CARRIER_NUMBER_TYPES:
+                carrier_name = self.lookup(phonenumbers.format_number(numobj, phonenumbers.PhoneNumberFormat.E164)[1:])[1] or ""
+            return self._country_name(numobj), carrier_name, self._country_time_zones(numobj)
+
+        digits = phonenumbers.format_number(numobj, phonenumbers.PhoneNumberFormat.E164)[1:]
+        area, carrier_name, zones = self.lookup(digits)
+
+        # The geocoder strips the country's mobile token (e.g. Argentina's 9) before its area lookup
+        mobile_token = phonenumbers.country_mobile_token(numobj.country_code)
+        national_number = phonenumbers.national_significant_number(numobj)
+        if mobile_token and national_number.startswith(mobile_token):
+            region = phonenumbers.region_code_for_country_code(numobj.country_code)
+            try:
+                stripped = phonenumbers.parse(national_number[len(mobile_token):], region)
+                area = self.lookup(phonenumbers.format_number(stripped, phonenumbers.PhoneNumberFormat.E164)[1:])[0]
+            except phonenumbers.NumberParseException:
+                pass
+
+        if number_type not in CARRIER_NUMBER_TYPES:
+            carrier_name = ""
+        return (
+            area or self._country_name(numobj),
+            carrier_name or "",
+            tuple(zones.split(TZ_SEPARATOR)) if zones else UNKNOWN_TIME_ZONES
+        )
+
+    def close(self):
+        self._tables = []
+        self._string_offsets = None
+        self._mmap.close()
+        self._file.close()
+
+
+def generate_corpus(size, seed=0):
+    """Yield a seeded corpus of parsed numbers around each region's example numbers"""
+    rng = random.Random(seed)
+    samples = []
+    for region in sorted(phonenumbers.SUPPORTED_REGIONS):
+        for number_type in (PhoneNumberType.MOBILE, PhoneNumberType.FIXED_LINE, PhoneNumberType.TOLL_FREE,
+                            PhoneNumberType.VOIP, PhoneNumberType.PAGER):
+            example = phonenumbers.example_number_for_type(region, number_type)
+            if example is not None:
+                samples.append(phonenumbers.format_number(example, phonenumbers.PhoneNumberFormat.E164))
+    for i in range(size):
+        base = samples[i % len(samples)]
+        keep = rng.randint(max(3, len(base) - 7), len(base))
+        number = base[:keep] + ''.join(rng.choice('0123456789') for _ in range(len(base) - keep))
+        try:
+            yield phonenumbers.parse(number, None)
+        except phonenumbers.NumberParseException:
+            continue
+
+
+def verify_prefix_index(index, numbers):
+    """Compare index answers against the phonenumbers library; return (checked, mismatches)"""
+    from phonenumbers import geocoder, carrier, timezone
+
+    checked = 0
+    mismatches = []
+    for numobj in numbers:
+        expected = (
+            geocoder.description_for_number(numobj, index.locale),
+            carrier.name_for_number(numobj, index.locale),
+            tuple(timezone.time_zones_for_number(numobj))
+        )
+        actual = index.describe(numobj)
+        checked += 1
+        if actual != expected:
+            mismatches.append((phonenumbers.format_number(numobj, phonenumbers.PhoneNumberFormat.E164), expected, actual))
+    return checked, mismatches
+
+
+def main(argv=None):
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build or verify the compact prefix index")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="compile phonenumbers prefix data into an index file")
+    build.add_argument('--locale', default='en')
+    build.add_argument('--output', default='prefix_index.bin')
+    build.add_argument('--no-verify', action='store_true', help="skip verification after building")
+    verify = sub.add_parser('verify', help="compare an index against the phonenumbers library")
+    verify.add_argument('--index', default='prefix_index.bin')
+    for p in (build, verify):
+        p.add_argument('--corpus', metavar='FILE', help="E164 numbers to verify against, one per line")
+        p.add_argument('--corpus-size', type=int, default=50000, help="size of the generated corpus")
+        p.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_prefix_index(args.output, args.locale)
+        if args.no_verify:
+            return 0
+        path = args.output
+    else:
+        path = args.index
+
+    index = PrefixIndex(path)
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8') as f:
+            numbers = (phonenumbers.parse(line.strip(), None) for line in f if line.strip())
+            checked, mismatches = verify_prefix_index(index, numbers)
+    else:
+        checked, mismatches = verify_prefix_index(index, generate_corpus(args.corpus_size, args.seed))
+
+    for e164, expected, actual in mismatches[:20]:
+        logger.error(f"Mismatch for {e164}: library={expected} index={actual}")
+    logger.info(f"Verified {checked} numbers against phonenumbers {phonenumbers.__version__}: {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
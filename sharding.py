@@ -0,0 +1,414 @@
+"""Multi-process worker sharding for the phone lookup bot.
+
+A front process receives updates (polling or webhook, as usual) and hands each
+one to one of N workers, chosen by chat id (or user id when there is no chat).
+A chat therefore always lands on the same worker, which runs that chat's
+updates strictly one after another while still handling other chats
+concurrently.
+
+Workers run the normal PhoneNumberBot handlers, but their Bot API requests go
+through a QueueRequest: each request is shipped to the front process, which
+sends it through its outbound scheduler (see outbound.py) and shared connection
+pool and returns the response. Flood limits are therefore enforced in one place
+for all workers.
+
+    SHARD_WORKERS=4 python phone_lookup_bot.py                        # worker processes
+    SHARD_WORKERS=4 SHARD_TRANSPORT=local python phone_lookup_bot.py  # in-process stand-in
+
+The admin /stats command is answered by the front: it asks every worker for a
+snapshot of its streaming stats (stream_stats.py) and merges them, so the reply
+covers the whole bot rather than the worker that owns the admin's chat.
+
+The 'local' transport keeps the same front/worker split but runs the workers as
+tasks on the front's event loop over asyncio queues. It exercises the same
+dispatch and outbound code on one process, which is useful for testing.
+"""
+import asyncio
+import logging
+import itertools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import Update
+from telegram.error import NetworkError, TimedOut
+from telegram.ext import Application, ApplicationHandlerStop, CommandHandler, TypeHandler, filters
+from telegram.request import BaseRequest
+from telegram._utils.defaultvalue import DefaultValue
+
+import phone_lookup_bot as bot_module
+from outbound import OUTBOUND_PRIORITY, ScheduledRequest, outbound_priority, collect_scheduler_metrics
+from stream_stats import StreamingStats
+
+logger = logging.getLogger(__name__)
+
+WORKER_START_TIMEOUT = 120.0
+SHUTDOWN_TIMEOUT = 30.0
+STATS_TIMEOUT = 5.0
+
+
+def shard_key(update):
+    """Key that keeps one chat's (or, without a chat, one user's) updates on one worker"""
+    chat = update.effective_chat
+    if chat is not None:
+        return chat.id
+    user = update.effective_user
+    if user is not None:
+        return user.id
+    return update.update_id
+
+
+class LocalQueue:
+    """asyncio.Queue with the put/get interface of ProcessQueue"""
+
+    def __init__(self):
+        self._queue = asyncio.Queue()
+
+    def put(self, item):
+        self._queue.put_nowait(item)
+
+    async def get(self):
+        return await self._queue.get()
+
+
+class ProcessQueue:
+    """multiprocessing.Queue whose get() can be awaited (it blocks a dedicated reader thread)"""
+
+    def __init__(self, context):
+        self._queue = context.Queue()
+        self._reader = None
+
+    def __getstate__(self):
+        return {'_queue': self._queue, '_reader': None}
+
+    def put(self, item):
+        self._queue.put(item)
+
+    async def get(self):
+        if self._reader is None:
+            self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shard-queue')
+        return await asyncio.get_running_loop().run_in_executor(self._reader, self._queue.get)
+
+
+class ShardTransport:
+    """Queues connecting the front to its workers: one inbox and one reply queue per worker,
+    a shared outbound queue of Bot API requests, a queue on which workers report ready and
+    one on which they return stats snapshots"""
+
+    MODES = ('process', 'local')
+
+    def __init__(self, workers, mode='process'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown shard transport: {mode!r} (expected one of {', '.join(self.MODES)})")
+        self.mode = mode
+        self.workers = workers
+        if mode == 'process':
+            # spawn, not fork: the front already has an event loop and threads running
+            self.context = multiprocessing.get_context('spawn')
+            make_queue = lambda: ProcessQueue(self.context)  # noqa: E731
+        else:
+            self.context = None
+            make_queue = LocalQueue
+        self.inboxes = [make_queue() for _ in range(workers)]
+        self.replies = [make_queue() for _ in range(workers)]
+        self.outbound = make_queue()
+        self.ready = make_queue()
+        self.stats = make_queue()
+
+
+class ForwardedRequestData:
+    """The parts of telegram.request.RequestData that HTTPXRequest reads, rebuilt from plain values"""
+
+    def __init__(self, json_parameters, multipart_data):
+        self.json_parameters = json_parameters
+        self.multipart_data = multipart_data or {}
+        self.contains_files = bool(multipart_data)
+
+
+class QueueRequest(BaseRequest):
+    """Bot API request backend for workers: requests are sent by the front process"""
+
+    def __init__(self, index, outbound, replies):
+        self.index = index
+        self.outbound = outbound
+        self.replies = replies
+        self._ids = itertools.count()
+        self._pending = {}
+        self._reader = None
+
+    async def initialize(self):
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read_replies())
+
+    async def shutdown(self):
+        if self._reader is not None:
+            self.replies.put(None)
+            await self._reader
+            self._reader = None
+
+    async def _read_replies(self):
+        while True:
+            item = await self.replies.get()
+            if item is None:
+                return
+            request_id, status, payload, error = item
+            future = self._pending.pop(request_id, None)
+            if future is None or future.done():
+                continue
+            if error is not None:
+                kind, message = error
+                future.set_exception(TimedOut(message) if kind == 'TimedOut' else NetworkError(message))
+            else:
+                future.set_result((status, payload))
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        timeouts = {
+            name: value for name, value in (('read_timeout', read_timeout), ('write_timeout', write_timeout),
+                                            ('connect_timeout', connect_timeout), ('pool_timeout', pool_timeout))
+            if not isinstance(value, DefaultValue)
+        }
+        data = None
+        if request_data is not None:
+            data = (request_data.json_parameters, request_data.multipart_data if request_data.contains_files else None)
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self.outbound.put((self.index, request_id, url, method, data, timeouts, OUTBOUND_PRIORITY.get()))
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+
+class ShardWorker:
+    """Runs PhoneNumberBot handlers for the updates of one shard, in order per chat"""
+
+    def __init__(self, index, transport, token, concurrency=bot_module.CONCURRENT_UPDATES):
+        self.index = index
+        self.inbox = transport.inboxes[index]
+        self.ready = transport.ready
+        self.stats = transport.stats
+        self.request = QueueRequest(index, transport.outbound, transport.replies[index])
+        snapshot_path = f"{bot_module.STATS_SNAPSHOT_PATH}.{index}" if bot_module.STATS_SNAPSHOT_PATH else ''
+        self.bot = bot_module.PhoneNumberBot(token, request=self.request, stats_snapshot_path=snapshot_path,
+                                             shard=index)
+        self.bot.setup_handlers()
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._tails = {}
+        self.processed = 0
+
+    def dispatch(self, update):
+        """Schedule update to run after the previous update of the same chat"""
+        key = shard_key(update)
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._process_after(previous, update))
+        self._tails[key] = task
+        task.add_done_callback(lambda t: self._tails.pop(key) if self._tails.get(key) is t else None)
+
+    async def _process_after(self, previous, update):
+        if previous is not None:
+            await asyncio.wait({previous})
+        async with self._semaphore:
+            await self.bot.app.process_update(update)
+        self.processed += 1
+
+    async def serve(self):
+        """Process updates from the inbox until the front sends None; ('stats', id) asks for a stats snapshot"""
+        app = self.bot.app
+        await app.initialize()
+        await self.bot.post_init(app)
+        self.ready.put(self.index)
+        logger.info(f"Shard worker {self.index} ready")
+        try:
+            while True:
+                data = await self.inbox.get()
+                if data is None:
+                    break
+                if isinstance(data, tuple):
+                    _, request_id = data
+                    self.stats.put((request_id, self.index, self.bot.stats.snapshot()))
+                    continue
+                self.dispatch(Update.de_json(data, app.bot))
+            if self._tails:
+                await asyncio.wait(set(self._tails.values()))
+        finally:
+            await self.bot.post_shutdown(app)
+            await app.shutdown()
+            logger.info(f"Shard worker {self.index} stopped after {self.processed} updates")
+
+
+def run_worker(index, transport, token):
+    """Entry point of a worker process"""
+    metrics_port = bot_module.METRICS_PORT + 1 + index if bot_module.METRICS_PORT else 0
+    bot_module.start_metrics_endpoint(metrics_port)
+    asyncio.run(ShardWorker(index, transport, token).serve())
+
+
+class ShardedFront:
+    """Receives updates, shards them across workers and sends the workers' Bot API requests"""
+
+    def __init__(self, token, workers, transport='process'):
+        if workers < 1:
+            raise ValueError("Sharding needs at least one worker.")
+        self.token = token
+        self.transport = ShardTransport(workers, transport)
+        self.outbound_request = bot_module.make_outbound_request()
+        self.dispatched = [0] * workers
+        self.forwarded = 0
+        self._processes = []
+        self._local_workers = []
+        self._worker_tasks = []
+        self._outbound_task = None
+        self._stats_ids = itertools.count()
+        self._stats_pending = {}
+        self._stats_task = None
+        self.metrics_server = None
+
+        builder = (
+            Application.builder()
+            .token(token)
+            .request(bot_module.InstrumentedRequest(connection_pool_size=8))
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+        )
+        if bot_module.TELEGRAM_API_URL:
+            builder = builder.base_url(f"{bot_module.TELEGRAM_API_URL.rstrip('/')}/bot")
+            builder = builder.base_file_url(f"{bot_module.TELEGRAM_API_URL.rstrip('/')}/file/bot")
+        self.app = builder.build()
+        # Group -1 runs first; answering /stats here stops it from being dispatched to a worker
+        self.app.add_handler(CommandHandler("stats", self.stats_command,
+                                            filters=filters.User(user_id=bot_module.ADMIN_ID)), group=-1)
+        self.app.add_handler(TypeHandler(Update, self.dispatch))
+        self.app.add_error_handler(self.error_handler)
+        if isinstance(self.outbound_request, ScheduledRequest):
+            bot_module.METRICS.add_collector(lambda: collect_scheduler_metrics(self.outbound_request.scheduler))
+
+        if transport == 'local':
+            self._local_workers = [ShardWorker(i, self.transport, token) for i in range(workers)]
+
+    async def dispatch(self, update, context):
+        """Hand the update to its shard's worker"""
+        index = shard_key(update) % self.transport.workers
+        self.transport.inboxes[index].put(update.to_dict())
+        self.dispatched[index] += 1
+
+    async def error_handler(self, update, context):
+        logger.error(f"Could not dispatch update {update}: {context.error}")
+
+    async def _read_stats(self):
+        while True:
+            item = await self.transport.stats.get()
+            if item is None:
+                return
+            request_id, index, snapshot = item
+            # Late answers to a request that already timed out are dropped
+            pending = self._stats_pending.get(request_id)
+            if pending is None or index in pending['answered']:
+                continue
+            pending['answered'].add(index)
+            pending['stats'].merge(snapshot)
+            if len(pending['answered']) == self.transport.workers and not pending['done'].done():
+                pending['done'].set_result(None)
+
+    async def collect_stats(self):
+        """Merge every worker's stats snapshot; returns (stats, number of workers that answered)"""
+        request_id = next(self._stats_ids)
+        pending = self._stats_pending[request_id] = {
+            'stats': StreamingStats(), 'answered': set(), 'done': asyncio.get_running_loop().create_future()
+        }
+        try:
+            for inbox in self.transport.inboxes:
+                inbox.put(('stats', request_id))
+            await asyncio.wait({pending['done']}, timeout=STATS_TIMEOUT)
+            return pending['stats'], len(pending['answered'])
+        finally:
+            del self._stats_pending[request_id]
+
+    async def stats_command(self, update, context):
+        """Answer the admin /stats with the stats of all workers combined"""
+        try:
+            stats, answered = await self.collect_stats()
+            workers = self.transport.workers
+            notes = [f"ℹ️ {workers} वर्कर्स का संयुक्त डेटा (combined across {workers} workers)"]
+            if answered < workers:
+                notes = [f"⚠️ केवल {answered}/{workers} वर्कर्स ने उत्तर दिया — आँकड़े अधूरे हैं "
+                         f"(only {answered} of {workers} workers answered; figures are partial)"]
+            await update.message.reply_text(bot_module.format_stats(stats, notes), parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Error in stats command: {e}")
+            await update.message.reply_text("Stats are unavailable right now.")
+        raise ApplicationHandlerStop
+
+    async def _forward(self, item):
+        index, request_id, url, method, data, timeouts, priority = item
+        request_data = ForwardedRequestData(*data) if data is not None else None
+        try:
+            with outbound_priority(priority):
+                status, payload = await self.outbound_request.do_request(url, method, request_data, **timeouts)
+            reply = (request_id, status, payload, None)
+        except TimedOut as e:
+            reply = (request_id, None, None, ('TimedOut', str(e)))
+        except Exception as e:
+            reply = (request_id, None, None, ('NetworkError', str(e)))
+        self.transport.replies[index].put(reply)
+        self.forwarded += 1
+
+    async def _serve_outbound(self):
+        pending = set()
+        while True:
+            item = await self.transport.outbound.get()
+            if item is None:
+                break
+            task = asyncio.create_task(self._forward(item))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+
+    async def post_init(self, application):
+        await self.outbound_request.initialize()
+        self._outbound_task = asyncio.create_task(self._serve_outbound())
+        self._stats_task = asyncio.create_task(self._read_stats())
+        self._worker_tasks = [asyncio.create_task(worker.serve()) for worker in self._local_workers]
+        # Hold off receiving updates until every worker has started and prewarmed
+        for _ in range(self.transport.workers):
+            await asyncio.wait_for(self.transport.ready.get(), WORKER_START_TIMEOUT)
+        logger.info(f"All {self.transport.workers} shard workers ready")
+
+    async def post_shutdown(self, application):
+        """Stop the workers after they drain their inboxes, then the outbound path"""
+        for inbox in self.transport.inboxes:
+            inbox.put(None)
+        if self._worker_tasks:
+            await asyncio.wait(self._worker_tasks, timeout=SHUTDOWN_TIMEOUT)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Shard worker {process.name} did not stop in time, terminating")
+                process.terminate()
+        self.transport.stats.put(None)
+        if self._stats_task is not None:
+            await self._stats_task
+        self.transport.outbound.put(None)
+        if self._outbound_task is not None:
+            await self._outbound_task
+        await self.outbound_request.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        logger.info(f"Sharded front stopped: dispatched {self.dispatched}, forwarded {self.forwarded} API requests")
+
+    def run(self, mode=bot_module.BOT_MODE):
+        if self.transport.mode == 'process':
+            for index in range(self.transport.workers):
+                process = self.transport.context.Process(
+                    target=run_worker, args=(index, self.transport, self.token), name=f'shard-{index}'
+                )
+                process.start()
+                self._processes.append(process)
+        logger.info(f"Sharded front starting in {mode} mode with {self.transport.workers} "
+                    f"{self.transport.mode} workers")
+        self.metrics_server = bot_module.start_metrics_endpoint(bot_module.METRICS_PORT)
+        bot_module.run_application(self.app, mode)
@@ -0,0 +1,277 @@
+"""Constant-memory streaming aggregates for the admin /stats command.
+
+Traffic is recorded into rings of time buckets: 60 one-minute buckets (for the
+5 minute and 1 hour windows) and 24 one-hour buckets (for 24 hours). Each
+bucket holds:
+
+- request/error counters over a small fixed set of series
+- a HyperLogLog sketch of user ids, for unique users
+- Space-Saving heavy-hitter sketches of countries and carriers, for top-N
+- number-type counts (a dozen fixed types)
+
+Recording touches one bucket per ring, so it is O(1) and memory stays fixed
+no matter how much traffic arrives. Queries merge the buckets inside the
+window. Bucket start times are wall-clock, so a saved snapshot can be
+restored after a restart and buckets that have aged out are simply ignored.
+"""
+import os
+import json
+import math
+import time
+import hashlib
+import logging
+import contextvars
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (('5m', 300), ('1h', 3600), ('24h', 86400))
+
+# Stats of the bot whose update (or background task) is running in the current context
+CURRENT_STATS = contextvars.ContextVar('current_stats', default=None)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**precision one-byte registers"""
+
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, item):
+        h = int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch keeping at most k counters
+
+    A new item arriving when all k counters are taken replaces the smallest
+    one and inherits its count, so counts are upper bounds and any item with
+    frequency above total/k is guaranteed to be present.
+    """
+
+    def __init__(self, k=32, counts=None):
+        self.k = k
+        self.counts = dict(counts or {})
+
+    def add(self, item, n=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += n
+        elif len(counts) < self.k:
+            counts[item] = n
+        else:
+            victim = min(counts, key=counts.get)
+            counts[item] = counts.pop(victim) + n
+
+    def merge(self, other):
+        for item, n in other.counts.items():
+            self.add(item, n)
+
+    def top(self, n):
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+class StatsBucket:
+    __slots__ = ('start', 'counts', 'types', 'users', 'countries', 'carriers')
+
+    def __init__(self, precision, top_k):
+        self.users = HyperLogLog(precision)
+        self.countries = SpaceSaving(top_k)
+        self.carriers = SpaceSaving(top_k)
+        self.reset(None)
+
+    def reset(self, start):
+        self.start = start
+        self.counts = {}
+        self.types = {}
+        self.users.registers = bytearray(self.users.m)
+        self.countries.counts = {}
+        self.carriers.counts = {}
+
+
+class BucketRing:
+    """size buckets of resolution seconds each, reused round-robin"""
+
+    def __init__(self, resolution, size, precision=10, top_k=32):
+        self.resolution = resolution
+        self.size = size
+        self.precision = precision
+        self.top_k = top_k
+        self.buckets = [StatsBucket(precision, top_k) for _ in range(size)]
+
+    def current(self, now):
+        start = int(now // self.resolution) * self.resolution
+        bucket = self.buckets[(start // self.resolution) % self.size]
+        if bucket.start is None or bucket.start < start:
+            bucket.reset(start)
+        return bucket
+
+    def window(self, seconds, now):
+        """Buckets overlapping the last seconds (to bucket resolution)"""
+        oldest = int(now // self.resolution) * self.resolution - (math.ceil(seconds / self.resolution) - 1) * self.resolution
+        return [b for b in self.buckets if b.start is not None and b.start >= oldest and b.start <= now]
+
+
+class StreamingStats:
+    """Sliding-window request, user, country, carrier, type and error statistics"""
+
+    def __init__(self, precision=10, top_k=32):
+        self.minutes = BucketRing(60, 60, precision, top_k)
+        self.hours = BucketRing(3600, 24, precision, top_k)
+        self.started = time.time()
+
+    def _buckets(self, now):
+        now = time.time() if now is None else now
+        return self.minutes.current(now), self.hours.current(now)
+
+    def record_request(self, kind, user_id=None, now=None):
+        for bucket in self._buckets(now):
+            bucket.counts[kind] = bucket.counts.get(kind, 0) + 1
+            if user_id is not None:
+                bucket.users.add(user_id)
+
+    def record_event(self, kind, now=None):
+        """Count an event (error, invalid number, ...) that is not itself a request"""
+        for bucket in self._buckets(now):
+            bucket.counts[kind] = bucket.counts.get(kind, 0) + 1
+
+    def record_number(self, country, carrier, number_type, now=None):
+        for bucket in self._buckets(now):
+            if country:
+                bucket.countries.add(country)
+            if carrier:
+                bucket.carriers.add(carrier)
+            bucket.types[number_type] = bucket.types.get(number_type, 0) + 1
+
+    def summary(self, seconds, top_n=5, now=None):
+        """Aggregate the window ending now; counts are exact, users and top-N approximate"""
+        now = time.time() if now is None else now
+        ring = self.minutes if seconds <= self.minutes.resolution * self.minutes.size else self.hours
+        counts, types = {}, {}
+        users = HyperLogLog(ring.precision)
+        countries = SpaceSaving(ring.top_k * 2)
+        carriers = SpaceSaving(ring.top_k * 2)
+        for bucket in ring.window(seconds, now):
+            for key, n in bucket.counts.items():
+                counts[key] = counts.get(key, 0) + n
+            for key, n in bucket.types.items():
+                types[key] = types.get(key, 0) + n
+            users.merge(bucket.users)
+            countries.merge(bucket.countries)
+            carriers.merge(bucket.carriers)
+        return {
+            'seconds': seconds,
+            'counts': counts,
+            'users': users.count(),
+            'types': types,
+            'countries': countries.top(top_n),
+            'carriers': carriers.top(top_n)
+        }
+
+    def snapshot(self):
+        """A JSON-ready copy of the buckets that shares no mutable state with them"""
+        def dump(ring):
+            return [{
+                'start': b.start, 'counts': dict(b.counts), 'types': {str(k): v for k, v in b.types.items()},
+                'users': b.users.registers.hex(), 'countries': dict(b.countries.counts),
+                'carriers': dict(b.carriers.counts)
+            } for b in ring.buckets if b.start is not None]
+        return {'version': 1, 'started': self.started, 'minutes': dump(self.minutes), 'hours': dump(self.hours)}
+
+    def restore(self, data):
+        for name in ('minutes', 'hours'):
+            ring = getattr(self, name)
+            for item in data.get(name, []):
+                start = int(item['start'])
+                bucket = ring.buckets[(start // ring.resolution) % ring.size]
+                if bucket.start is not None and bucket.start > start:
+                    continue
+                bucket.reset(start)
+                bucket.counts = dict(item['counts'])
+                bucket.types = {int(k): v for k, v in item['types'].items()}
+                registers = bytes.fromhex(item['users'])
+                if len(registers) == bucket.users.m:
+                    bucket.users.registers = bytearray(registers)
+                bucket.countries.counts = dict(item['countries'])
+                bucket.carriers.counts = dict(item['carriers'])
+
+    def merge(self, data):
+        """Add a snapshot (e.g. another shard's) into these stats: counts add, user sketches
+        take the register max and heavy hitters merge. Buckets older than ours are skipped."""
+        self.started = min(self.started, data.get('started', self.started))
+        for name in ('minutes', 'hours'):
+            ring = getattr(self, name)
+            for item in data.get(name, []):
+                start = int(item['start'])
+                bucket = ring.buckets[(start // ring.resolution) % ring.size]
+                if bucket.start is not None and bucket.start > start:
+                    continue
+                if bucket.start != start:
+                    bucket.reset(start)
+                for key, n in item['counts'].items():
+                    bucket.counts[key] = bucket.counts.get(key, 0) + n
+                for key, n in item['types'].items():
+                    bucket.types[int(key)] = bucket.types.get(int(key), 0) + n
+                registers = bytes.fromhex(item['users'])
+                if len(registers) == bucket.users.m:
+                    bucket.users.merge(HyperLogLog(ring.precision, registers))
+                bucket.countries.merge(SpaceSaving(counts=item['countries']))
+                bucket.carriers.merge(SpaceSaving(counts=item['carriers']))
+
+    def save(self, path):
+        """Write a snapshot to path atomically"""
+        write_snapshot(path, self.snapshot())
+
+    def load(self, path):
+        """Restore a snapshot from path if it exists; return True when something was loaded"""
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.restore(json.load(f))
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Could not load stats snapshot {path}: {e}")
+            return False
+
+
+def write_snapshot(path, data):
+    """Write snapshot data to path atomically; safe off the thread that records, as data is a copy"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class StatsErrorHandler(logging.Handler):
+    """Counts ERROR-level log records as 'error' events of the stats in CURRENT_STATS
+
+    One handler serves every bot in the process; records logged outside any
+    bot's context are not counted.
+    """
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record):
+        stats = CURRENT_STATS.get()
+        if stats is not None:
+            stats.record_event('error')